@@ -4,5 +4,9 @@ from .before_scenario import before_scenario
 from .after_scenario import after_scenario
 from .before_step import before_step
 from .after_step import after_step
+from .after_all import after_all
 from .report import report
 from .config import Config
+from .stats import cache_stats
+from .profiler import set_profile_callback, write_profile
+from .index import write_index
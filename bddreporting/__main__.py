@@ -0,0 +1,42 @@
+import sys
+import argparse
+import logging
+from .render import render_journal, load_settings
+from .fragments import merge_fragments
+from .config import Config
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( prog="python -m bddreporting", description="bddreporting command line tools" )
+    commands = parser.add_subparsers( dest="command", required=True )
+
+    render = commands.add_parser( "render", help="render the reports of a journal again without running behave" )
+    render.add_argument( "journal", help="journal file written by a test run (journal_file setting)" )
+    render.add_argument( "--config", help="JSON file with settings that override the settings of the journal" )
+    render.add_argument( "--feature", action="append", help="render reports of matching features only (shell wildcards, repeatable)" )
+    render.add_argument( "--scenario", action="append", help="render reports of matching scenarios only (shell wildcards, repeatable)" )
+    render.add_argument( "--tag", action="append", help="render reports with a matching tag only (shell wildcards, repeatable)" )
+    render.add_argument( "--jobs", "-j", type=int, default=None, help="number of worker processes (default: number of CPUs)" )
+
+    merge = commands.add_parser( "merge", help="assemble the report fragments of sharded test runs into one report per feature" )
+    merge.add_argument( "fragment_dir", help="fragment directory of the workers (fragment_dir setting)" )
+    merge.add_argument( "--config", help="JSON file with the settings used for the conversion" )
+    merge.add_argument( "--keep", action="store_true", help="keep the fragments after merging" )
+
+    args = parser.parse_args( argv )
+    logging.basicConfig( level=logging.INFO, format="%(levelname)s: %(message)s" )
+
+    if args.command == "render":
+        settings = load_settings( args.config ) if args.config else {}
+        count, errors = render_journal( args.journal, settings, args.feature, args.scenario, args.tag, args.jobs )
+        logging.info( "rendered %d report(s), %d failed", count, len( errors ) )
+        return 1 if errors else 0
+    if args.command == "merge":
+        if args.config:
+            Config.update( **load_settings( args.config ) )
+        count, errors = merge_fragments( args.fragment_dir, args.keep )
+        logging.info( "merged %d feature report(s), %d failed", count, len( errors ) )
+        return 1 if errors else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit( main() )
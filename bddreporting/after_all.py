@@ -0,0 +1,10 @@
+from .writer import finish_reports
+from .profiler import profile
+
+def after_all(func):
+    def wrapper(*args, **kwargs):
+        with profile( "hook", "after_all" ):
+            finish_reports()
+        result = func(*args, **kwargs)
+        return result
+    return wrapper
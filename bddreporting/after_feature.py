@@ -1,10 +1,18 @@
-from .utils import write_text
+from .writer import submit_report
+from .index import record_feature
+from .plan import feature_plan
+from .outline import flush_outline_report
+from .profiler import profile
 
 def after_feature(func):
     def wrapper(*args, **kwargs):
         feature = args[1]
-        if hasattr(feature, "log") and len( feature.log ) > 0:
-            write_text( feature.log, feature.filename, feature.name, "_unknown_", feature.tags )
+        with profile( "hook", "after_feature" ):
+            plan = feature_plan( feature )
+            record_feature( feature, plan )
+            flush_outline_report( feature )
+            if hasattr(feature, "log") and len( feature.log ) > 0:
+                submit_report( feature.log, feature.filename, feature.name, "_unknown_", feature.tags, kind="feature", plan=plan )
         result = func(*args, **kwargs)
         return result
     return wrapper
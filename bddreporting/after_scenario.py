@@ -1,54 +1,75 @@
-from .utils import extract_multiline_string, applyJinja2Template
+from .utils import applyJinja2Template
 import sys
 from .config import Config
-from .utils import write_text, get_current_date_time
+from .buffer import ReportBuffer, new_report_buffer
+from .fragments import write_fragment
+from .utils import get_current_date_time
+from .writer import submit_report
+from .index import record_scenario
+from .plan import scenario_plan
+from .outline import outline_of, outline_template, collect_outline_row, flush_outline_report
+from .profiler import profile
 
 def after_scenario(func):
     def wrapper(*args, **kwargs):
         context = args[0]
         scenario = args[1]
 
-        report_tag = Config.get("report_tag", "report")
+        with profile( "hook", "after_scenario" ):
+            config = Config.snapshot()
+            plan = scenario_plan( context )
+            record_scenario( scenario, plan )
 
-        if not ( not report_tag or report_tag in scenario.tags):
-            return 
+            if not plan.reported:
+                return 
 
-        # Create a directory based on the feature name
-        scenario_name = scenario.name
+            header = plan.header
 
-        if Config.get("scenario_header", False ):
-            header = Config.get("scenario_header", "")
-        else:
-            header = extract_multiline_string( scenario.description )
+            current_date, current_time = get_current_date_time()
 
-        current_date, current_time = get_current_date_time()
-
-        outline_parameter = { "scenario": scenario.name , "feature": scenario.feature.name, "date": current_date, "time": current_time }
-        if context.active_outline:
+            outline_parameter = { "scenario": scenario.name , "feature": scenario.feature.name, "date": current_date, "time": current_time }
             row = context.active_outline
-            outline_parameter = outline_parameter | dict(zip(row.headings, row.cells))
-            scenario_name = scenario_name.format(**outline_parameter)
-        try:
-            header = applyJinja2Template( header, outline_parameter )    
-        except:
-            pass
-
-        text = ""
-        if header and len( header ) > 0:
-            text = header + "\n" * 2
-
-        # Ensure the log is set up in the context (you could accumulate log messages in context.log during the steps)
-        if hasattr(context, "log"): 
-            text += context.log
+            outline = outline_of( scenario ) if row else None
+            if outline is not None:
+                # the header template is prepared once per outline, only the row values change
+                outline_parameter.update( zip( row.headings, row.cells ) )
+                header = outline_template( outline ).render( outline_parameter )
+            else:
+                if row:
+                    outline_parameter.update( zip( row.headings, row.cells ) )
+                try:
+                    header = applyJinja2Template( header, outline_parameter )    
+                except:
+                    pass
+
+            text = new_report_buffer()
+            if header and len( header ) > 0:
+                text += header + "\n" * 2
+
+            # Ensure the log is set up in the context (you could accumulate log messages in context.log during the steps)
+            if hasattr(context, "log"): 
+                if config.stream_scenario_log and isinstance( context.log, ReportBuffer ):
+                    # the spooled log becomes part of the report without being copied
+                    context.log.flush( spill=True )
+                    text.attach( context.log )
+                else:
+                    text += context.log
             
-        if len( text ) > 0:
-            if Config.get("export_scenario", True):
-                write_text( text, context.feature.filename, context.feature.name, scenario.name, scenario.tags )
-            elif hasattr(context.feature, "log"):
-                pass
-                context.feature.log += text
-
-        if Config.get("halt_execution_on_failure", False) and context.failed:
+            if len( text ) > 0:
+                if config.export_scenario and config.consolidate_outlines and outline is not None:
+                    collect_outline_row( context.feature, outline, scenario, row, text, plan )
+                elif config.export_scenario:
+                    flush_outline_report( context.feature )
+                    submit_report( text, context.feature.filename, context.feature.name, scenario.name, scenario.tags, plan=plan )
+                elif config.fragment_dir:
+                    write_fragment( text, context.feature, scenario.name, scenario.line )
+                elif hasattr(context.feature, "log"):
+                    if config.stream_scenario_log:
+                        context.feature.log.attach( text )
+                    else:
+                        context.feature.log += text
+
+        if config.halt_execution_on_failure and context.failed:
             sys.exit("Exiting the behave test runner.")
         result = func(*args, **kwargs)
         return result
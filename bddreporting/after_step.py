@@ -1,9 +1,10 @@
-import uuid
 from .config import Config
+from .profiler import profile
 def after_step(func):
     def wrapper(*args, **kwargs):
-        context = args[0]
-        step = args[1] 
+        with profile( "hook", "after_step" ):
+            context = args[0]
+            step = args[1] 
         result = func(*args, **kwargs)
         return result
     return wrapper
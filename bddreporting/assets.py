@@ -0,0 +1,124 @@
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import threading
+from .config import Config
+from .utils import applyJinja2Template
+
+# Content-addressed store for images and attachments referenced from reports.
+# Every file is stored once under the hash of its content, so a plot embedded
+# in many scenarios, formats and runs exists only once on disk. Stored files
+# never share their data with the source, which may be rewritten in place.
+
+READ_SIZE = 1048576
+
+# FICLONE ioctl of Linux, clones a file on copy-on-write file systems
+_FICLONE = 0x40049409
+
+_lock = threading.Lock()
+_asset_stats = { "stored": 0, "reused": 0 }
+
+def asset_directory(feature_file_directory, filename="", feature_name=""):
+    config = Config.snapshot()
+    path_dict = { "filename": filename, "feature": feature_name }
+    return os.path.join( feature_file_directory, applyJinja2Template( config.asset_dir, path_dict ) )
+
+def _file_digest(path):
+    # not cached, a file rewritten in place can keep its size and modification time
+    sha = hashlib.sha256()
+    with open( path, "rb" ) as file:
+        for block in iter( lambda: file.read( READ_SIZE ), b"" ):
+            sha.update( block )
+    return sha.hexdigest()
+
+def _reflink(source, target):
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open( source, "rb" ) as src, open( target, "wb" ) as dst:
+            fcntl.ioctl( dst.fileno(), _FICLONE, src.fileno() )
+        return True
+    except OSError:
+        return False
+
+def _place_file(source, directory, suffix):
+    # reflink (copy-on-write) or copy, never a hard link that changes with the
+    # source; the copy is hashed, so it is named after the content it has
+    fd, tmp_path = tempfile.mkstemp( dir=directory, prefix=".bddreporting-" )
+    os.close( fd )
+    try:
+        if not _reflink( source, tmp_path ):
+            shutil.copyfile( source, tmp_path )
+        target = os.path.join( directory, _file_digest( tmp_path ) + ( suffix or "" ) )
+        if os.path.exists( target ):
+            os.remove( tmp_path )
+            return target, False
+        os.replace( tmp_path, target )
+        return target, True
+    except BaseException:
+        if os.path.exists( tmp_path ):
+            os.remove( tmp_path )
+        raise
+
+def _place_bytes(data, target):
+    fd, tmp_path = tempfile.mkstemp( dir=os.path.dirname( target ), prefix=".bddreporting-" )
+    try:
+        with os.fdopen( fd, "wb" ) as file:
+            file.write( data )
+        os.replace( tmp_path, target )
+    except BaseException:
+        if os.path.exists( tmp_path ):
+            os.remove( tmp_path )
+        raise
+
+def store_asset(source, directory, base_directory, suffix=None):
+    """
+    Store a file or bytes in the asset directory and return its path.
+
+    `source` is a path or a bytes object. The asset is named after the sha256
+    of its content plus `suffix` (default: the suffix of the source file), so
+    equal content is stored only once. The returned path is relative to
+    `base_directory` and uses forward slashes, as needed in markdown.
+    """
+    if isinstance( source, ( bytes, bytearray, memoryview ) ):
+        data = bytes( source )
+        digest = hashlib.sha256( data ).hexdigest()
+    else:
+        source = os.path.join( base_directory, os.fspath( source ) )
+        data = None
+        digest = _file_digest( source )
+        if suffix is None:
+            suffix = os.path.splitext( source )[1]
+
+    target = os.path.join( directory, digest + ( suffix or "" ) )
+    with _lock:
+        if os.path.exists( target ):
+            _asset_stats["reused"] += 1
+        else:
+            os.makedirs( directory, exist_ok=True )
+            stored = True
+            if data is None:
+                target, stored = _place_file( source, directory, suffix )
+            else:
+                _place_bytes( data, target )
+            _asset_stats["stored" if stored else "reused"] += 1
+    return os.path.relpath( target, base_directory ).replace( os.sep, "/" )
+
+def asset_helper(feature):
+    """
+    The `asset` function of the step and feature file templates.
+
+    Paths are relative to the feature file directory, which is the working
+    directory of pandoc, so `![plot](${asset("plot.png")})` is embedded.
+    """
+    base_directory = feature.feature_file_abspath
+    def asset(source, suffix=None):
+        directory = asset_directory( base_directory, os.path.basename( feature.filename ), feature.name )
+        return store_asset( source, directory, base_directory, suffix )
+    return asset
+
+def asset_info():
+    return dict( _asset_stats )
@@ -1,35 +1,37 @@
 import os
-import json
-import codecs
-import sys
-from datetime import datetime
-from .utils import extract_multiline_string, applyJinja2Template, get_current_date_time
+from .utils import applyJinja2Template, get_current_date_time
 from .config import Config
+from .buffer import new_report_buffer
+from .fragments import write_fragment
+from .plan import new_feature_plan
+from .profiler import profile
 
 def before_feature(func):
     def wrapper(*args, **kwargs):
         feature = args[1]
-        feature.feature_file_abspath = os.path.dirname ( os.path.abspath( feature.filename ) )
-        current_date, current_time = get_current_date_time()
+        with profile( "hook", "before_feature" ):
+            feature.feature_file_abspath = os.path.dirname ( os.path.abspath( feature.filename ) )
+            current_date, current_time = get_current_date_time()
 
-        report_tag = Config.get("report_tag", "report")
+            config = Config.snapshot()
+            plan = feature.bddreporting_plan = new_feature_plan( feature )
 
-        if not ( not report_tag or report_tag in feature.tags):
-            return
+            if not plan.reported:
+                return
 
-        if not Config.get("export_scenario", False):
+            if not config.export_scenario:
 
-            header = ""
-            if Config.get("feature_header", False ):
-                header = Config.get("feature_header", "")
-            else:
-                header = extract_multiline_string( feature.description )
+                header = plan.header
 
-            feature_parameter = { "date": current_date, "time": current_time }
-            header = applyJinja2Template( header, feature_parameter )  
+                feature_parameter = { "date": current_date, "time": current_time }
+                header = applyJinja2Template( header, feature_parameter )  
 
-            if header and len( header ) > 0:
-                feature.log = header + "\n" * 2  
+                if header and len( header ) > 0:
+                    if config.fragment_dir:
+                        # the feature header comes first in the merged report
+                        write_fragment( header + "\n" * 2, feature, "_unknown_", 0 )
+                    else:
+                        feature.log = new_report_buffer( header + "\n" * 2 )
         result = func(*args, **kwargs)
         return result
     return wrapper
\ No newline at end of file
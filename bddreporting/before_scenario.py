@@ -1,12 +1,16 @@
 import os
 from .config import Config
+from .plan import new_scenario_plan
+from .profiler import profile
 def before_scenario(func):
     def wrapper(*args, **kwargs):
         context = args[0]
         scenario = args[1]
+        with profile( "hook", "before_scenario" ):
+            context.bddreporting_plan = new_scenario_plan( scenario )
 
-        if Config.get("halt_execution_on_failure", False) and context.failed:
-            context.scenario.skip("Skipping execution")
+            if Config.snapshot().halt_execution_on_failure and context.failed:
+                context.scenario.skip("Skipping execution")
 
         result = func(*args, **kwargs)
         return result
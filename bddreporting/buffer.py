@@ -0,0 +1,216 @@
+import os
+import tempfile
+import weakref
+from .config import Config
+
+# number of characters read from a spill file at once
+READ_SIZE = 65536
+
+def _remove_file(path):
+    try:
+        os.remove( path )
+    except OSError:
+        pass
+
+class ReportBuffer:
+    """
+    Append-only report text made of chunks.
+
+    Appending with `+=` stores the chunk instead of copying the whole text, so
+    a report grows in linear time. Once more than `spill_size` characters are
+    held in memory, the chunks are moved to a temporary file in `spill_dir`.
+    `attach` appends another buffer by reference, so a spilled scenario log
+    becomes part of a report without being read back into memory.
+    `str(buffer)` returns the complete text for code that expects a string.
+    """
+
+    def __init__(self, text="", spill_size=None, spill_dir=None):
+        self._chunks = []
+        self._memory_size = 0
+        self._size = 0
+        self._spill_size = spill_size
+        self._spill_dir = spill_dir
+        self._spill_path = None
+        self._finalizer = None
+        if text:
+            self.append( text )
+
+    @property
+    def spilled(self):
+        # true if some of the text is held in a spill file
+        return self._spill_path is not None or any( isinstance( chunk, ReportBuffer ) and chunk.spilled for chunk in self._chunks )
+
+    @property
+    def spill_path(self):
+        self.flush()
+        return self._spill_path
+
+    def append(self, text):
+        if isinstance( text, ReportBuffer ):
+            for chunk in text:
+                self._append_chunk( chunk )
+        else:
+            self._append_chunk( str( text ) )
+        return self
+
+    def attach(self, buffer):
+        # appends `buffer` without copying it; it must not change afterwards
+        if len( buffer ) > 0:
+            self._chunks.append( buffer )
+            self._size += len( buffer )
+        return self
+
+    def input_files(self):
+        """
+        The text as a list of files to be concatenated, e.g. for pandoc.
+
+        In-memory parts are written to spill files first, attached buffers
+        contribute their own files.
+        """
+        segments = []
+        pending = []
+        for chunk in self._chunks:
+            if isinstance( chunk, ReportBuffer ):
+                if pending:
+                    segments.append( self._spill_segment( pending ) )
+                    pending = []
+                segments.append( chunk )
+            else:
+                pending.append( chunk )
+        if pending:
+            segments.append( self._spill_segment( pending ) )
+        self._chunks = segments
+        self._memory_size = 0
+
+        files = [ self._spill_path ] if self._spill_path is not None else []
+        for segment in segments:
+            files.extend( segment.input_files() )
+        return files
+
+    def _spill_segment(self, chunks):
+        segment = ReportBuffer( spill_dir=self._spill_dir )
+        for chunk in chunks:
+            segment._append_chunk( chunk )
+        segment.flush( spill=True )
+        return segment
+
+    def _append_chunk(self, chunk):
+        if not chunk:
+            return
+        self._chunks.append( chunk )
+        self._memory_size += len( chunk )
+        self._size += len( chunk )
+        if self._spill_size is not None and self._memory_size > self._spill_size:
+            self.flush( spill=True )
+
+    def flush(self, spill=False):
+        # moves the in-memory chunks to the spill file
+        if not self._chunks or not ( spill or self._spill_path is not None ):
+            return
+        if self._spill_path is None:
+            spill_dir = self._spill_dir
+            if spill_dir:
+                # absolute, so the file is found from pandoc's working directory
+                spill_dir = os.path.abspath( spill_dir )
+                os.makedirs( spill_dir, exist_ok=True )
+            fd, self._spill_path = tempfile.mkstemp( dir=spill_dir, prefix=".bddreporting-", suffix=".md" )
+            os.close( fd )
+            self._finalizer = weakref.finalize( self, _remove_file, self._spill_path )
+        with open( self._spill_path, "a", encoding="utf-8", newline="" ) as file:
+            for chunk in self._chunks:
+                if isinstance( chunk, ReportBuffer ):
+                    chunk.write_to( file )
+                else:
+                    file.write( chunk )
+        self._chunks = []
+        self._memory_size = 0
+
+    def close(self):
+        self._chunks = []
+        self._memory_size = 0
+        self._size = 0
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+        self._spill_path = None
+
+    def __iadd__(self, text):
+        return self.append( text )
+
+    def __add__(self, text):
+        return ReportBuffer( self, self._spill_size, self._spill_dir ).append( text )
+
+    def __radd__(self, text):
+        return ReportBuffer( text, self._spill_size, self._spill_dir ).append( self )
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        if self._spill_path is not None:
+            with open( self._spill_path, "r", encoding="utf-8", newline="" ) as file:
+                while True:
+                    chunk = file.read( READ_SIZE )
+                    if not chunk:
+                        break
+                    yield chunk
+        for chunk in list( self._chunks ):
+            if isinstance( chunk, ReportBuffer ):
+                yield from chunk
+            else:
+                yield chunk
+
+    def head(self, size):
+        # the first `size` characters, without reading the whole buffer
+        parts = []
+        remaining = size
+        for chunk in self:
+            parts.append( chunk )
+            remaining -= len( chunk )
+            if remaining <= 0:
+                break
+        return "".join( parts )[:size]
+
+    def getvalue(self):
+        return "".join( self )
+
+    def __str__(self):
+        return self.getvalue()
+
+    def __repr__(self):
+        return f"<ReportBuffer {self._size} characters{' (spilled)' if self.spilled else ''}>"
+
+    def write_to(self, file, strip=False):
+        chunks = strip_chunks( self ) if strip else iter( self )
+        for chunk in chunks:
+            file.write( chunk )
+
+def strip_chunks(chunks):
+    # yields the chunks like "".join(chunks).strip() without joining them
+    started = False
+    pending = ""
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            yield pending + body
+            pending = chunk[len( body ):]
+        else:
+            pending += chunk
+
+def new_report_buffer(text=""):
+    return ReportBuffer( text, Config.snapshot().report_buffer_spill_size )
+
+def new_scenario_log(scenario):
+    # with stream_scenario_log, the step output of a scenario is spooled to a
+    # file in its report directory once it exceeds stream_memory_cap
+    config = Config.snapshot()
+    if not config.stream_scenario_log:
+        return new_report_buffer()
+    from .utils import report_target
+    directory = report_target( scenario.feature.filename, scenario.feature.name, scenario.name )[1]
+    return ReportBuffer( spill_size=config.stream_memory_cap, spill_dir=directory )
@@ -1,17 +1,150 @@
-import jsonschema
 import sys
-from jsonschema import validate as validate_json
+import copy
+from types import MappingProxyType
+
+class ConfigSnapshot:
+    """
+    Immutable view of validated settings plus data derived from them.
+
+    A new snapshot is built by `Config.update`, so hooks can read it with plain
+    attribute access instead of validating the settings on every lookup.
+    """
+
+    __slots__ = (
+        "version",
+        "settings",
+        "report_tag",
+        "report_dir",
+        "report_file_basename",
+        "asset_dir",
+        "process_gherkin_doc_string",
+        "scenario_header",
+        "feature_header",
+        "export_scenario",
+        "consolidate_outlines",
+        "halt_execution_on_failure",
+        "mako_module_directory",
+        "writer_mode",
+        "writer_workers",
+        "writer_max_pending",
+        "batch_workers",
+        "report_buffer_spill_size",
+        "stream_scenario_log",
+        "stream_memory_cap",
+        "incremental",
+        "force_rebuild",
+        "incremental_ignore_volatile",
+        "journal_file",
+        "index_file",
+        "fragment_dir",
+        "worker_id",
+        "profile",
+        "profile_output",
+        "pandoc_pool_size",
+        "pandoc_pool_timeout",
+        "formats",
+        "known_formats",
+        "format_tags",
+        "default_formats",
+        "tag_formats",
+    )
+
+    def __init__(self, settings, version):
+        settings = copy.deepcopy(settings)
+        formats = settings.get("formats", {})
+        values = {
+            "version": version,
+            "settings": MappingProxyType(settings),
+            "report_tag": settings.get("report_tag"),
+            "report_dir": settings.get("report_dir", "reports"),
+            "report_file_basename": settings.get("report_file_basename", "{{scenario}}"),
+            "asset_dir": settings.get("asset_dir", "reports/assets"),
+            "process_gherkin_doc_string": settings.get("process_gherkin_doc_string", True),
+            # a falsy header means "use the description of the feature / scenario"
+            "scenario_header": settings.get("scenario_header") or None,
+            "feature_header": settings.get("feature_header") or None,
+            "export_scenario": settings.get("export_scenario", False),
+            "consolidate_outlines": settings.get("consolidate_outlines", False),
+            "halt_execution_on_failure": settings.get("halt_execution_on_failure", False),
+            "mako_module_directory": settings.get("mako_module_directory"),
+            "writer_mode": settings.get("writer_mode", "sync"),
+            "writer_workers": settings.get("writer_workers", 2),
+            "writer_max_pending": settings.get("writer_max_pending", 8),
+            "batch_workers": settings.get("batch_workers"),
+            "report_buffer_spill_size": settings.get("report_buffer_spill_size"),
+            "stream_scenario_log": settings.get("stream_scenario_log", False),
+            "stream_memory_cap": settings.get("stream_memory_cap", 1048576),
+            "incremental": settings.get("incremental", False),
+            "force_rebuild": settings.get("force_rebuild", False),
+            "incremental_ignore_volatile": settings.get("incremental_ignore_volatile", True),
+            "journal_file": settings.get("journal_file"),
+            "index_file": settings.get("index_file"),
+            "fragment_dir": settings.get("fragment_dir"),
+            "worker_id": settings.get("worker_id"),
+            "profile": settings.get("profile", False),
+            "profile_output": settings.get("profile_output"),
+            "pandoc_pool_size": settings.get("pandoc_pool_size", 2),
+            "pandoc_pool_timeout": settings.get("pandoc_pool_timeout", 120),
+            "formats": MappingProxyType(formats),
+            "known_formats": frozenset(formats.keys()),
+            # (format, lowercased tag) pairs in configuration order
+            "format_tags": tuple((ext, ext.lower()) for ext in formats.keys()),
+            "default_formats": tuple(f for f in settings.get("default_formats", []) if f in formats),
+            # formats resolved per tag set, filled by formats_for_tags
+            "tag_formats": {},
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot is immutable, use Config.update instead")
+
+    def is_reported(self, tags):
+        return not self.report_tag or self.report_tag in tags
+
+    def formats_for_tags(self, tags):
+        # resolved once per tag set, the returned tuple is shared
+        key = tags if isinstance(tags, frozenset) else frozenset(tags)
+        valid_formats = self.tag_formats.get(key)
+        if valid_formats is None:
+            lower_tags = {tag.lower() for tag in key}
+            valid_formats = tuple(ext for ext, tag in self.format_tags if tag in lower_tags)
+            if len(valid_formats) == 0:
+                valid_formats = self.default_formats
+            self.tag_formats[key] = valid_formats
+        return valid_formats
 
 class Config:
     _settings = {
         "report_tag": None,
         "report_dir": "reports/{{filename}}/",
         "report_file_basename": "{{feature}}",
+        "asset_dir": "reports/assets",
         "process_gherkin_doc_string": True,
         "scenario_header": "## {{scenario}}\n\n",
         "feature_header": "# {{feature}}\n\n",
         "export_scenario": False,
+        "consolidate_outlines": False,
         "halt_execution_on_failure": False,
+        "mako_module_directory": None,
+        "writer_mode": "sync",
+        "writer_workers": 2,
+        "writer_max_pending": 8,
+        "batch_workers": None,
+        "report_buffer_spill_size": 16777216,
+        "stream_scenario_log": False,
+        "stream_memory_cap": 1048576,
+        "incremental": False,
+        "force_rebuild": False,
+        "incremental_ignore_volatile": True,
+        "journal_file": None,
+        "index_file": None,
+        "fragment_dir": None,
+        "worker_id": None,
+        "profile": False,
+        "profile_output": "bddreporting-profile.json",
+        "pandoc_pool_size": 2,
+        "pandoc_pool_timeout": 120,
         "default_formats": [ "docx", "txt"],
         "formats": {
             "docx": {
@@ -52,6 +185,10 @@ class Config:
                 "type": "string",
                 "description": "base name of a report file"
             },
+            "asset_dir": {
+                "type": "string",
+                "description": "Directory of the content-addressed asset store, relative to the feature file"
+            },
             "process_gherkin_doc_string": {
                 "type": "boolean",
                 "description": "Flag to enable or disable processing of Gherkin doc strings"
@@ -68,10 +205,98 @@ class Config:
                 "type": "boolean",
                 "description": "export scenario"
             },
+            "consolidate_outlines": {
+                "type": "boolean",
+                "description": "With export_scenario, write all Examples rows of a Scenario Outline into one report"
+            },
             "halt_execution_on_failure": {
                 "type": "boolean",
                 "description": "Flag to determine whether to exit on step failure"
             },
+            "mako_module_directory": {
+                "type": ["string", "null"],
+                "description": "Directory where compiled Mako step templates are cached between runs. null keeps them in memory only"
+            },
+            "writer_mode": {
+                "type": "string",
+                "enum": ["sync", "async", "batch"],
+                "description": "sync writes reports in the hooks, async queues them to background workers, batch converts all reports at the end of the run"
+            },
+            "writer_workers": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "Number of background workers in async writer mode"
+            },
+            "writer_max_pending": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "Number of queued reports after which the hooks wait for the async writer"
+            },
+            "batch_workers": {
+                "type": ["integer", "null"],
+                "minimum": 1,
+                "description": "Number of parallel conversions in batch writer mode. null uses the number of CPUs"
+            },
+            "report_buffer_spill_size": {
+                "type": ["integer", "null"],
+                "minimum": 0,
+                "description": "Number of characters of a report kept in memory before it is moved to a temporary file. null keeps reports in memory"
+            },
+            "stream_scenario_log": {
+                "type": "boolean",
+                "description": "Spool the step output of each scenario to a file in its report directory instead of keeping it in memory"
+            },
+            "stream_memory_cap": {
+                "type": "integer",
+                "minimum": 0,
+                "description": "Number of characters of step output kept in memory before it is written to the spool file with stream_scenario_log"
+            },
+            "incremental": {
+                "type": "boolean",
+                "description": "Skip the conversion of reports whose output exists and whose content is unchanged since the last run"
+            },
+            "force_rebuild": {
+                "type": "boolean",
+                "description": "Convert all reports even if they are unchanged in incremental mode"
+            },
+            "incremental_ignore_volatile": {
+                "type": "boolean",
+                "description": "Ignore the rendered {{date}} and {{time}} values when comparing reports in incremental mode"
+            },
+            "journal_file": {
+                "type": ["string", "null"],
+                "description": "JSON Lines file recording every report of the run for python -m bddreporting render. null disables the journal"
+            },
+            "index_file": {
+                "type": ["string", "null"],
+                "description": "JSON index of the features, scenarios and reports of the run. A markdown and an HTML page with the same base name are written next to it. null disables the index"
+            },
+            "fragment_dir": {
+                "type": ["string", "null"],
+                "description": "Directory for the per-scenario report fragments of sharded runs. null writes feature reports directly"
+            },
+            "worker_id": {
+                "type": ["string", "null"],
+                "description": "Name of this worker in sharded runs. null uses host name and process id"
+            },
+            "profile": {
+                "type": "boolean",
+                "description": "Record wall and CPU time of hooks, step rendering and format conversion"
+            },
+            "profile_output": {
+                "type": ["string", "null"],
+                "description": "File the profile summary is written to at the end of the run, .csv for CSV, JSON otherwise"
+            },
+            "pandoc_pool_size": {
+                "type": "integer",
+                "minimum": 1,
+                "description": "Number of long-lived pandoc workers used by formats with the pool backend"
+            },
+            "pandoc_pool_timeout": {
+                "type": ["number", "null"],
+                "exclusiveMinimum": 0,
+                "description": "Seconds to wait for a pandoc worker of the pool backend before it is stopped and the report is converted by a pandoc subprocess. null waits forever"
+            },
             "default_formats": {
                 "type": "array",
                 "items": {
@@ -86,7 +311,14 @@ class Config:
                 "patternProperties": {
                     "^[a-zA-Z0-9_]+$": {
                     "type": "object",
-                    "description": "Additional arguments for any format."
+                    "description": "Additional arguments for any format.",
+                    "properties": {
+                        "backend": {
+                            "type": "string",
+                            "enum": ["subprocess", "pool", "native"],
+                            "description": "subprocess starts pandoc per conversion, pool uses long-lived pandoc workers, native writes md, plain text and html in-process"
+                        }
+                    }
                     }
                 }
             }
@@ -103,26 +335,48 @@ class Config:
         "additionalProperties": False
     }
 
+    _snapshot = None
+    _version = 0
+
     @classmethod
     def update(cls, **kwargs):
-        cls._settings.update( kwargs )
-        cls.__validate()
+        settings = dict( cls._settings )
+        settings.update( kwargs )
+        cls.__validate( settings )
+        cls._settings = settings
+        cls.__build_snapshot()
 
     @classmethod
     def get(cls, key, default=None):
-        cls.__validate()
-        return cls._settings.get(key, default)
+        return cls.snapshot().settings.get(key, default)
 
     @classmethod
     def all(cls):
-        cls.__validate()
-        return cls._settings
+        return copy.deepcopy( dict( cls.snapshot().settings ) )
+
+    @classmethod
+    def snapshot(cls):
+        # the defaults are validated lazily on first use
+        snapshot = cls._snapshot
+        if snapshot is None:
+            cls.__validate( cls._settings )
+            snapshot = cls.__build_snapshot()
+        return snapshot
+
+    @classmethod
+    def __build_snapshot( cls ):
+        cls._version += 1
+        cls._snapshot = ConfigSnapshot( cls._settings, cls._version )
+        return cls._snapshot
 
     @classmethod
-    def __validate( cls ):
+    def __validate( cls, settings ):
+        # jsonschema is only loaded when settings are validated the first time
+        import jsonschema
+        from jsonschema import validate as validate_json
         try:
             # Validate the JSON object against the schema
-            validate_json(instance=cls._settings, schema=cls._schema)
+            validate_json(instance=settings, schema=cls._schema)
             return True
         except jsonschema.exceptions.ValidationError as err:
             sys.exit(f"Invalid settings. Exiting the behave test runner. Validation Error: {err.message}")
@@ -0,0 +1,161 @@
+import os
+import re
+import sys
+import html
+import logging
+import importlib
+import threading
+from .buffer import ReportBuffer
+from .profiler import profile
+
+# In-process converters. Formats with the "native" backend are written by the
+# Python writers below instead of a pandoc process; `module` converters of
+# custom formats are imported once per run and reused.
+
+_front_matter_pattern = re.compile( r"\A---\s*\n.*?\n---\s*(\n|\Z)", re.S )
+
+def _strip_front_matter(text):
+    return _front_matter_pattern.sub( "", text, count=1 )
+
+def _has_front_matter(text):
+    head = text.head( 3 ) if isinstance( text, ReportBuffer ) else text[:3]
+    return head == "---"
+
+def write_markdown(text, output_file, options):
+    # passthrough of the report markdown, the front matter is dropped as by pandoc
+    with open( output_file, "w", encoding="utf-8" ) as file:
+        if isinstance( text, ReportBuffer ) and not _has_front_matter( text ):
+            text.write_to( file )
+        else:
+            file.write( _strip_front_matter( str( text ) ) )
+
+_plain_patterns = [
+    ( re.compile( r"^ {0,3}#{1,6}(?:[ \t]+(.*?))?[ \t]*#*[ \t]*$", re.M ), r"\1" ),
+    ( re.compile( r"!\[([^\]]*)\]\([^)]*\)" ), r"[\1]" ),
+    ( re.compile( r"\[([^\]]*)\]\([^)]*\)" ), r"\1" ),
+    ( re.compile( r"(\*\*|__)(.+?)\1" ), r"\2" ),
+    ( re.compile( r"(?<![\w*])([*_])(?!\s)(.+?)(?<!\s)\1(?![\w*])" ), r"\2" ),
+    ( re.compile( r"`([^`]*)`" ), r"\1" ),
+    ( re.compile( r"^ {0,3}\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$\n?", re.M ), "" ),
+    ( re.compile( r"\\([\\`*_{}\[\]()#+\-.!|<>])" ), r"\1" ),
+    ( re.compile( r"\n{3,}" ), "\n\n" ),
+]
+
+def markdown_to_plain(text):
+    lines = []
+    in_code = False
+    for line in _strip_front_matter( text ).split( "\n" ):
+        if line.lstrip().startswith( ( "```", "~~~" ) ):
+            in_code = not in_code
+            continue
+        lines.append( "    " + line if in_code else line )
+    text = "\n".join( lines )
+    for pattern, replacement in _plain_patterns:
+        text = pattern.sub( replacement, text )
+    return text.strip() + "\n"
+
+def write_plain(text, output_file, options):
+    with open( output_file, "w", encoding="utf-8" ) as file:
+        file.write( markdown_to_plain( str( text ) ) )
+
+def write_html(text, output_file, options):
+    import markdown
+    body = markdown.markdown( _strip_front_matter( str( text ) ), extensions=[ "tables", "fenced_code" ] )
+    if options.get("standalone"):
+        title = html.escape( os.path.splitext( os.path.basename( output_file ) )[0] )
+        body = f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{title}</title>\n</head>\n<body>\n{body}\n</body>\n</html>'
+    with open( output_file, "w", encoding="utf-8" ) as file:
+        file.write( body + "\n" )
+
+def _html_available():
+    try:
+        import markdown
+        return True
+    except ImportError:
+        return False
+
+# pandoc writer name -> ( writer, check for optional dependencies )
+NATIVE_WRITERS = {
+    "markdown": ( write_markdown, None ),
+    "md": ( write_markdown, None ),
+    "plain": ( write_plain, None ),
+    "html": ( write_html, _html_available ),
+}
+
+_available = {}
+
+def native_writer(to):
+    entry = NATIVE_WRITERS.get( to )
+    if entry is None:
+        return None
+    writer, check = entry
+    if check is not None:
+        if to not in _available:
+            _available[to] = check()
+            if not _available[to]:
+                logging.warning( "native writer for '%s' is not available (pip install markdown), using pandoc", to )
+        if not _available[to]:
+            return None
+    return writer
+
+def native_options(extra_args):
+    # the options of the native writers, None for any other argument
+    options = {}
+    for arg in extra_args:
+        if arg in ( "-s", "--standalone" ):
+            options["standalone"] = True
+        else:
+            return None
+    return options
+
+def convert_native(text, jobs):
+    """
+    Convert a report with the native writers.
+
+    jobs is a list of (to, extra_args, output_file, backend). Returns the jobs
+    that have to be converted by pandoc instead (no native writer, other
+    options) and a list of (output_file, error) for the failed jobs.
+    """
+    fallback = []
+    errors = []
+    for job in jobs:
+        to, extra_args, output_file, backend = job
+        writer = native_writer( to )
+        options = native_options( extra_args )
+        if writer is None or options is None:
+            fallback.append( ( to, extra_args, output_file, "subprocess" ) )
+            continue
+        try:
+            with profile( "convert", "native-" + to ):
+                writer( text, output_file, options )
+        except Exception as e:
+            errors.append( ( output_file, e ) )
+    return fallback, errors
+
+# converters of custom formats, keyed by module name and directory
+_module_converters = {}
+_module_lock = threading.Lock()
+
+def module_converter(module_name, module_dir, feature_file_directory):
+    """
+    The `convert` function of a custom format module, imported once per run.
+    Returns None if the module cannot be imported.
+    """
+    abs_module_dir = os.path.join( feature_file_directory, module_dir ) if module_dir else None
+    key = ( module_name, abs_module_dir )
+    try:
+        return _module_converters[key]
+    except KeyError:
+        pass
+    with _module_lock:
+        if key not in _module_converters:
+            if abs_module_dir and os.path.exists( abs_module_dir ) and abs_module_dir not in sys.path:
+                sys.path.append( abs_module_dir )
+            try:
+                module = importlib.import_module( module_name )
+                logging.debug(f"Successfully imported module '{module_name}'.")
+                _module_converters[key] = module.convert
+            except ( ImportError, AttributeError ) as e:
+                logging.warning(f"Could not import module '{module_name}': {e}")
+                _module_converters[key] = None
+        return _module_converters[key]
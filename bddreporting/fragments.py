@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import tempfile
+from .config import Config
+
+# Reports of sharded test runs. Every worker writes one fragment per scenario,
+# keyed by feature file and line, instead of its own partial feature report.
+# merge_fragments assembles the fragments into one ordered report per feature.
+
+FRAGMENT_SUFFIX = ".fragment.json"
+LOCK_FILENAME = ".lock"
+
+class FileLock:
+    """
+    Inter-process lock based on exclusively created lock files.
+
+    A lock file older than `stale_after` seconds is considered left over from
+    a crashed process and removed.
+    """
+
+    def __init__(self, path, timeout=60.0, stale_after=300.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open( self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY )
+                os.write( fd, str( os.getpid() ).encode("ascii") )
+                os.close( fd )
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat( self.path ).st_mtime > self.stale_after:
+                        os.remove( self.path )
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError( f"Could not acquire lock {self.path}" )
+                time.sleep( 0.01 )
+
+    def __exit__(self, *args):
+        try:
+            os.remove( self.path )
+        except OSError:
+            pass
+
+def worker_id():
+    return Config.snapshot().worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+def feature_key(filename):
+    # feature files are identified by their path relative to the working directory, so
+    # workers on different machines agree on the key
+    relative = os.path.relpath( os.path.abspath( filename ) ).replace( os.sep, "/" )
+    digest = hashlib.sha1( relative.encode("utf-8") ).hexdigest()[:12]
+    return f"{os.path.basename( relative )}-{digest}", relative
+
+def write_fragment(text, feature, scenario_name, line):
+    fragment_dir = Config.snapshot().fragment_dir
+    key, relative = feature_key( feature.filename )
+    directory = os.path.join( fragment_dir, key )
+    os.makedirs( directory, exist_ok=True )
+
+    record = {
+        "filename": relative,
+        "feature": feature.name,
+        "tags": list( feature.tags ),
+        "scenario": scenario_name,
+        "line": line,
+        "worker": worker_id(),
+        "text": str( text ),
+    }
+    fd, temp_file = tempfile.mkstemp( dir=directory, prefix=".", suffix=".tmp" )
+    with os.fdopen( fd, "w", encoding="utf-8" ) as file:
+        json.dump( record, file, ensure_ascii=False )
+    with FileLock( os.path.join( directory, LOCK_FILENAME ) ):
+        os.replace( temp_file, os.path.join( directory, f"{line:08d}{FRAGMENT_SUFFIX}" ) )
+
+def read_fragments(directory):
+    fragments = []
+    for name in os.listdir( directory ):
+        if name.endswith( FRAGMENT_SUFFIX ):
+            with open( os.path.join( directory, name ), "r", encoding="utf-8" ) as file:
+                fragments.append( ( name, json.load( file ) ) )
+    fragments.sort( key=lambda fragment: fragment[1]["line"] )
+    return fragments
+
+def merge_fragments(fragment_dir, keep=False):
+    """
+    Assemble the fragments of every feature into one report and convert it once.
+
+    Returns the number of merged features and a list of (feature file, error).
+    """
+    from .utils import write_text
+    from .journal import record_report, close_journal
+
+    merged = 0
+    errors = []
+    if not os.path.isdir( fragment_dir ):
+        return merged, errors
+
+    for key in sorted( os.listdir( fragment_dir ) ):
+        directory = os.path.join( fragment_dir, key )
+        if not os.path.isdir( directory ):
+            continue
+        with FileLock( os.path.join( directory, LOCK_FILENAME ) ):
+            fragments = read_fragments( directory )
+            if len( fragments ) == 0:
+                continue
+            first = fragments[0][1]
+            text = "".join( fragment["text"] for name, fragment in fragments )
+            try:
+                # the merged report is journaled, so sharded runs can be rendered again
+                record_report( text, first["filename"], first["feature"], "_unknown_", first["tags"], "feature" )
+                write_text( text, first["filename"], first["feature"], "_unknown_", first["tags"] )
+                merged += 1
+            except Exception as e:
+                logging.error("Failed to merge report for '%s': %s", first["filename"], e)
+                errors.append( ( first["filename"], e ) )
+                continue
+            if not keep:
+                for name, fragment in fragments:
+                    os.remove( os.path.join( directory, name ) )
+    close_journal()
+    return merged, errors
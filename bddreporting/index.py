@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import html
+import atexit
+import threading
+from urllib.parse import quote
+from .config import Config
+
+# Run-wide index of the features, scenarios and reports. The hooks record one
+# small slotted entry per scenario and feature; paths and pages are only
+# built when the index is written at the end of the run.
+
+class FeatureEntry:
+
+    __slots__ = ( "filename", "name", "line", "tags", "status", "duration", "reports", "scenarios" )
+
+    def __init__(self, filename, name, line, tags):
+        self.filename = filename
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.status = "untested"
+        self.duration = 0.0
+        self.reports = ()
+        self.scenarios = []
+
+class ScenarioEntry:
+
+    __slots__ = ( "name", "line", "tags", "status", "steps", "failed_steps", "duration", "render_time", "reports" )
+
+    def __init__(self, name, line, tags, status, steps, failed_steps, duration, render_time, reports):
+        self.name = name
+        self.line = line
+        self.tags = tags
+        self.status = status
+        self.steps = steps
+        self.failed_steps = failed_steps
+        self.duration = duration
+        self.render_time = render_time
+        self.reports = reports
+
+_features = {}
+_tag_sets = {}
+_lock = threading.Lock()
+_atexit_registered = False
+_dirty = False
+
+def _tags(tags):
+    # equal tag lists share one tuple
+    tags = tuple( tags )
+    return _tag_sets.setdefault( tags, tags )
+
+def _status(status):
+    return sys.intern( getattr( status, "name", str( status ) ) )
+
+def _feature_entry(feature):
+    global _atexit_registered, _dirty
+    entry = _features.get( feature.filename )
+    if entry is None:
+        entry = _features[feature.filename] = FeatureEntry( feature.filename, feature.name, feature.line, _tags( feature.tags ) )
+        if not _atexit_registered:
+            atexit.register( write_index )
+            _atexit_registered = True
+    _dirty = True
+    return entry
+
+def _plan_reports(plan):
+    # the output files of the report planned for an item (see plan.py)
+    if plan is None or not plan.reported:
+        return ()
+    return plan.outputs
+
+def record_scenario(scenario, plan=None):
+    config = Config.snapshot()
+    if not config.index_file:
+        return
+    failed_steps = sum( 1 for step in scenario.steps if _status( step.status ) in ( "failed", "error" ) )
+    reports = _plan_reports( plan ) if config.export_scenario else ()
+    entry = ScenarioEntry( scenario.name, scenario.line, _tags( scenario.tags ), _status( scenario.status ), len( scenario.steps ), failed_steps,
+        scenario.duration or 0.0, getattr( scenario, "bddreporting_render_time", 0.0 ), reports )
+    with _lock:
+        _feature_entry( scenario.feature ).scenarios.append( entry )
+
+def record_feature(feature, plan=None):
+    config = Config.snapshot()
+    if not config.index_file:
+        return
+    with _lock:
+        entry = _feature_entry( feature )
+        entry.status = _status( feature.status )
+        entry.duration = feature.duration or 0.0
+        if not config.export_scenario:
+            entry.reports = _plan_reports( plan )
+
+def _existing(paths):
+    return [ path for path in paths if os.path.exists( path ) ]
+
+def build_index():
+    """
+    The index as a dictionary with the features, their scenarios and the
+    paths of their reports relative to the index file.
+    """
+    config = Config.snapshot()
+    base_directory = os.path.dirname( os.path.abspath( config.index_file ) )
+    relative = lambda path: os.path.relpath( path, base_directory ).replace( os.sep, "/" )
+    totals = {}
+    features = []
+    for feature in list( _features.values() ):
+        scenarios = []
+        for scenario in feature.scenarios:
+            totals[scenario.status] = totals.get( scenario.status, 0 ) + 1
+            reports = [ relative( path ) for path in _existing( scenario.reports ) ]
+            scenarios.append( {
+                "name": scenario.name,
+                "line": scenario.line,
+                "tags": list( scenario.tags ),
+                "status": scenario.status,
+                "steps": scenario.steps,
+                "failed_steps": scenario.failed_steps,
+                "duration": round( scenario.duration, 6 ),
+                "render_time": round( scenario.render_time, 6 ),
+                "reports": reports,
+            } )
+        reports = [ relative( path ) for path in _existing( feature.reports ) ]
+        features.append( {
+            "filename": relative( os.path.abspath( feature.filename ) ),
+            "name": feature.name,
+            "line": feature.line,
+            "tags": list( feature.tags ),
+            "status": feature.status,
+            "duration": round( feature.duration, 6 ),
+            "reports": reports,
+            "scenarios": scenarios,
+        } )
+    return { "summary": { "features": len( features ), "scenarios": sum( totals.values() ), "status": totals }, "features": features }
+
+def _markdown_links(paths):
+    return ", ".join( f"[{os.path.splitext( path )[1][1:] or path}](<{path}>)" for path in paths )
+
+def _html_links(paths):
+    return ", ".join( f'<a href="{html.escape( quote( path ) )}">{html.escape( os.path.splitext( path )[1][1:] or path )}</a>' for path in paths )
+
+def _summary_line(summary):
+    counts = ", ".join( f"{count} {status}" for status, count in sorted( summary["status"].items() ) )
+    return f"{summary['features']} feature(s), {summary['scenarios']} scenario(s): {counts or 'none'}"
+
+def render_markdown(index):
+    lines = [ "# Test Report Index", "", _summary_line( index["summary"] ), "" ]
+    for feature in index["features"]:
+        lines += [ f"## {feature['name']}", "", f"`{feature['filename']}` — {feature['status']}, {feature['duration']:.2f} s" ]
+        if feature["reports"]:
+            lines.append( "Reports: " + _markdown_links( feature["reports"] ) )
+        lines += [ "", "| Scenario | Status | Steps | Duration (s) | Reports |", "|---|---|---|---|---|" ]
+        for scenario in feature["scenarios"]:
+            name = scenario["name"].replace( "|", "\\|" )
+            lines.append( f"| {name} | {scenario['status']} | {scenario['steps']} | {scenario['duration']:.2f} | {_markdown_links( scenario['reports'] )} |" )
+        lines.append( "" )
+    return "\n".join( lines )
+
+def render_html(index):
+    parts = [ '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>Test Report Index</title>\n</head>\n<body>',
+        "<h1>Test Report Index</h1>", f"<p>{html.escape( _summary_line( index['summary'] ) )}</p>" ]
+    for feature in index["features"]:
+        parts.append( f"<h2>{html.escape( feature['name'] )}</h2>" )
+        reports = f" Reports: {_html_links( feature['reports'] )}" if feature["reports"] else ""
+        parts.append( f"<p><code>{html.escape( feature['filename'] )}</code> — {html.escape( feature['status'] )}, {feature['duration']:.2f} s.{reports}</p>" )
+        parts.append( "<table>\n<tr><th>Scenario</th><th>Status</th><th>Steps</th><th>Duration (s)</th><th>Reports</th></tr>" )
+        for scenario in feature["scenarios"]:
+            parts.append( f"<tr><td>{html.escape( scenario['name'] )}</td><td>{html.escape( scenario['status'] )}</td><td>{scenario['steps']}</td>"
+                f"<td>{scenario['duration']:.2f}</td><td>{_html_links( scenario['reports'] )}</td></tr>" )
+        parts.append( "</table>" )
+    parts.append( "</body>\n</html>\n" )
+    return "\n".join( parts )
+
+def write_index():
+    """
+    Write the index file (JSON) and a markdown and an HTML page with the
+    same base name. Called at the end of the run.
+    """
+    global _dirty
+    path = Config.snapshot().index_file
+    with _lock:
+        if not path or not _dirty:
+            return None
+        index = build_index()
+        directory = os.path.dirname( os.path.abspath( path ) )
+        os.makedirs( directory, exist_ok=True )
+        base = os.path.splitext( path )[0]
+        with open( path, "w", encoding="utf-8" ) as file:
+            json.dump( index, file, indent=2, ensure_ascii=False )
+        with open( base + ".md", "w", encoding="utf-8" ) as file:
+            file.write( render_markdown( index ) )
+        with open( base + ".html", "w", encoding="utf-8" ) as file:
+            file.write( render_html( index ) )
+        _dirty = False
+    return index
@@ -0,0 +1,90 @@
+import os
+import json
+import atexit
+import fnmatch
+import threading
+from .config import Config
+from .buffer import ReportBuffer
+
+# The journal is a JSON Lines file with one record per written report. The
+# first record of a run holds the settings, so the reports can be rendered
+# again without running the test suite (python -m bddreporting render).
+
+_journal = None
+_journal_lock = threading.Lock()
+_atexit_registered = False
+
+def record_report(text, filename, feature_name, scenario_name, tags, kind):
+    global _journal, _atexit_registered
+    path = Config.snapshot().journal_file
+    if not path:
+        return
+    with _journal_lock:
+        if _journal is None or _journal.name != os.path.abspath( path ):
+            if _journal is not None:
+                _journal.close()
+            directory = os.path.dirname( os.path.abspath( path ) )
+            os.makedirs( directory, exist_ok=True )
+            _journal = open( os.path.abspath( path ), "w", encoding="utf-8" )
+            write_record( { "type": "config", "settings": Config.all() } )
+            if not _atexit_registered:
+                atexit.register( close_journal )
+                _atexit_registered = True
+        write_record( {
+            "type": "report",
+            "kind": kind,
+            "filename": os.path.abspath( filename ),
+            "feature": feature_name,
+            "scenario": scenario_name,
+            "tags": list( tags ),
+        }, text )
+
+def write_record(record, text=None):
+    line = json.dumps( record, ensure_ascii=False )
+    if text is None:
+        _journal.write( line + "\n" )
+    else:
+        # the text is written chunk by chunk, so spilled reports are not loaded into memory
+        _journal.write( line[:-1] + ', "text": "' )
+        for chunk in ( text if isinstance( text, ReportBuffer ) else [ str( text ) ] ):
+            _journal.write( json.dumps( chunk, ensure_ascii=False )[1:-1] )
+        _journal.write( '"}\n' )
+    _journal.flush()
+
+def close_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is not None:
+            _journal.close()
+            _journal = None
+
+def read_journal(path):
+    # returns the settings of the run and the list of report records
+    settings = {}
+    reports = []
+    with open( path, "r", encoding="utf-8" ) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads( line )
+            if record.get("type") == "config":
+                settings = record.get("settings", {})
+            elif record.get("type") == "report":
+                reports.append( record )
+    return settings, reports
+
+def _matches(value, patterns):
+    return not patterns or any( fnmatch.fnmatchcase( value, pattern ) for pattern in patterns )
+
+def filter_reports(reports, features=None, scenarios=None, tags=None):
+    # patterns use shell wildcards; a report matches if any pattern of each given filter matches
+    selected = []
+    for record in reports:
+        if not _matches( record["feature"], features ):
+            continue
+        if not _matches( record["scenario"], scenarios ):
+            continue
+        if tags and not any( _matches( tag, tags ) for tag in record["tags"] ):
+            continue
+        selected.append( record )
+    return selected
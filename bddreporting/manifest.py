@@ -0,0 +1,70 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from .buffer import ReportBuffer
+
+# Content-addressed manifest of the outputs in a report directory. Each output
+# file is mapped to a hash of everything that goes into its conversion, so an
+# unchanged report does not need to be converted again.
+
+MANIFEST_FILENAME = ".bddreporting-manifest.json"
+
+# values produced for {{date}} / {{time}} in this process
+_volatile_values = set()
+_volatile_pattern = re.compile( r"(?<!\d)(\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{2})(?!\d)" )
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+def register_volatile(*values):
+    _volatile_values.update( values )
+
+def mask_volatile(text):
+    if not _volatile_values:
+        return text
+    return _volatile_pattern.sub( lambda match: "{{volatile}}" if match.group(0) in _volatile_values else match.group(0), text )
+
+def report_hash(text, ext, to, extra_args, front_matter, ignore_volatile=True):
+    digest = hashlib.sha256()
+    digest.update( json.dumps( [ ext, to, list( extra_args ), front_matter ], sort_keys=True, default=str ).encode("utf-8") )
+    chunks = text if isinstance( text, ReportBuffer ) else [ text ]
+    for chunk in chunks:
+        if ignore_volatile:
+            chunk = mask_volatile( chunk )
+        digest.update( chunk.encode("utf-8") )
+    return digest.hexdigest()
+
+def manifest_lock(directory_path):
+    path = os.path.join( os.path.abspath( directory_path ), MANIFEST_FILENAME )
+    with _locks_lock:
+        return _locks.setdefault( path, threading.Lock() )
+
+def load_manifest(directory_path):
+    try:
+        with open( os.path.join( directory_path, MANIFEST_FILENAME ), "r", encoding="utf-8" ) as file:
+            manifest = json.load( file )
+        return manifest if isinstance( manifest, dict ) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(directory_path, manifest):
+    fd, temp_file = tempfile.mkstemp( dir=directory_path, prefix=MANIFEST_FILENAME, suffix=".tmp" )
+    with os.fdopen( fd, "w", encoding="utf-8" ) as file:
+        json.dump( manifest, file, indent=2, sort_keys=True )
+    os.replace( temp_file, os.path.join( directory_path, MANIFEST_FILENAME ) )
+
+def is_up_to_date(manifest, output_file, digest):
+    return manifest.get( os.path.basename( output_file ) ) == digest and os.path.exists( output_file )
+
+def update_manifest(directory_path, produced, failed):
+    # produced maps output files to their hash, failed lists output files
+    with manifest_lock( directory_path ):
+        manifest = load_manifest( directory_path )
+        for output_file, digest in produced.items():
+            manifest[ os.path.basename( output_file ) ] = digest
+        for output_file in failed:
+            manifest.pop( os.path.basename( output_file ), None )
+        save_manifest( directory_path, manifest )
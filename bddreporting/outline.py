@@ -0,0 +1,117 @@
+import re
+import logging
+from .config import Config
+from .buffer import new_report_buffer
+from .utils import extract_multiline_string, compileJinja2Template, get_current_date_time
+from .writer import submit_report
+from .profiler import profile
+
+# Scenario Outlines expand into one scenario per Examples row. The header of
+# an outline is extracted and compiled once and rendered per row with the row
+# values. With consolidate_outlines, the rows of an outline are written as one
+# report instead of one report (and conversion) per row.
+
+_unsafe_name_pattern = re.compile( r'[<>:"/\\|?*]' )
+
+def outline_report_name(outline):
+    # the name of the consolidated report, the placeholders (<name>) and other
+    # characters that are not allowed in file names are dropped
+    name = _unsafe_name_pattern.sub( "", outline.name ).strip()
+    return name or "outline"
+
+def outline_of(scenario):
+    # the Scenario Outline a scenario was built from, None for plain scenarios
+    parent = getattr( scenario, "parent", None )
+    return parent if parent is not None and hasattr( parent, "examples" ) else None
+
+class OutlineTemplate:
+    """
+    The header template of a Scenario Outline, prepared once for all rows.
+    """
+
+    __slots__ = ( "version", "header", "template" )
+
+    def __init__(self, config, outline):
+        self.version = config.version
+        self.header = config.scenario_header or extract_multiline_string( outline.description )
+        self.template = None
+        if self.header:
+            try:
+                self.template = compileJinja2Template( self.header )
+            except Exception:
+                # an invalid template is used as it is, as for plain scenarios
+                pass
+
+    def render(self, parameters):
+        if self.template is None:
+            return self.header
+        with profile( "template", "jinja2" ):
+            try:
+                return self.template.render( parameters )
+            except Exception as e:
+                logging.error(f"An error occurred during template rendering: {e}")
+                return ""
+
+def outline_template(outline):
+    template = getattr( outline, "bddreporting_template", None )
+    if template is None or template.version != Config.snapshot().version:
+        template = outline.bddreporting_template = OutlineTemplate( Config.snapshot(), outline )
+    return template
+
+class OutlineReport:
+    """
+    The rows of a Scenario Outline collected for one consolidated report.
+    """
+
+    __slots__ = ( "outline", "plan", "headings", "rows", "text" )
+
+    def __init__(self, outline, plan, headings):
+        self.outline = outline
+        self.plan = plan
+        self.headings = tuple( headings )
+        self.rows = []
+        self.text = new_report_buffer()
+
+    def render(self, feature):
+        # header, a table of the Examples rows with their status, then the row logs
+        current_date, current_time = get_current_date_time()
+        # the placeholders of the outline name (<name>) would be read as html
+        name = self.outline.name.replace( "<", "\\<" )
+        header = outline_template( self.outline ).render( { "scenario": name, "feature": feature.name, "date": current_date, "time": current_time } )
+        text = new_report_buffer()
+        if header and len( header ) > 0:
+            text += header + "\n" * 2
+        escape = lambda value: str( value ).replace( "|", "\\|" )
+        text += "| " + " | ".join( escape( heading ) for heading in self.headings + ( "status", ) ) + " |\n"
+        text += "|" + "---|" * ( len( self.headings ) + 1 ) + "\n"
+        for cells, status in self.rows:
+            text += "| " + " | ".join( escape( cell ) for cell in cells + ( status, ) ) + " |\n"
+        text += "\n"
+        if Config.snapshot().stream_scenario_log:
+            text.attach( self.text )
+        else:
+            text += self.text
+        return text
+
+def collect_outline_row(feature, outline, scenario, row, text, plan):
+    # adds a row to the consolidated report of its outline, plan is the plan of the row
+    report = getattr( feature, "bddreporting_outline_report", None )
+    if report is not None and report.outline is not outline:
+        flush_outline_report( feature )
+        report = None
+    if report is None:
+        report = feature.bddreporting_outline_report = OutlineReport( outline, plan, row.headings )
+    report.rows.append( ( tuple( row.cells ), getattr( scenario.status, "name", str( scenario.status ) ) ) )
+    if Config.snapshot().stream_scenario_log:
+        report.text.attach( text )
+    else:
+        report.text += text
+
+def flush_outline_report(feature):
+    # submits the pending consolidated outline report of a feature
+    report = getattr( feature, "bddreporting_outline_report", None )
+    if report is None:
+        return
+    feature.bddreporting_outline_report = None
+    outline = report.outline
+    submit_report( report.render( feature ), feature.filename, feature.name, outline_report_name( outline ), outline.tags, plan=report.plan )
@@ -0,0 +1,151 @@
+import os
+import sys
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from .buffer import ReportBuffer
+from .profiler import profile
+
+# Pandoc is started directly with a working directory per process instead of
+# changing the working directory of the test runner, so conversions of one
+# report can run concurrently.
+
+_pandoc_path = None
+
+def get_pandoc_path():
+    global _pandoc_path
+    if _pandoc_path is None:
+        import pypandoc
+        _pandoc_path = pypandoc.get_pandoc_path()
+    return _pandoc_path
+
+def run_pandoc(source, from_format, to, extra_args=(), outputfile=None, cwd=None):
+    import pypandoc
+    args = [ get_pandoc_path(), "--from=" + pypandoc.normalize_format( from_format ), "--to=" + pypandoc.normalize_format( to ) ]
+    if outputfile:
+        args.append( "--output=" + str( outputfile ) )
+    args.extend( extra_args )
+
+    env = os.environ.copy()
+    env["PATH"] = env.get("PATH", "") + os.pathsep + os.path.dirname( get_pandoc_path() )
+    creation_flags = 0x08000000 if sys.platform == "win32" else 0
+
+    if isinstance( source, ReportBuffer ):
+        if source.spilled:
+            # large reports are read by pandoc from their spill files
+            args.extend( source.input_files() )
+            process = subprocess.run( args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env, creationflags=creation_flags )
+            source = None
+        else:
+            source = source.getvalue()
+    if source is not None:
+        if isinstance( source, str ):
+            source = source.encode("utf-8")
+        process = subprocess.run( args, input=source, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env, creationflags=creation_flags )
+    if process.returncode != 0:
+        raise RuntimeError( f'Pandoc died with exitcode "{process.returncode}" during conversion: {process.stderr.decode("utf-8", errors="replace")}' )
+    return process.stdout
+
+# reader options of pandoc, they have no effect when rendering from the JSON AST
+_reader_options = { "-f", "--from", "-r", "--read", "--default-image-extension", "--tab-stop", "--indented-code-classes",
+    "--abbreviations", "--extract-media", "--track-changes" }
+_reader_short_options = { "-f", "-r" }
+_reader_flags = { "-p", "--preserve-tabs", "--file-scope", "--strip-comments" }
+
+def split_reader_args(extra_args):
+    """
+    Split extra_args into the reader options, which apply when the markdown
+    is parsed, and the options of the writer.
+    """
+    reader_args = []
+    writer_args = []
+    args = iter( extra_args )
+    for arg in args:
+        name = arg.split( "=", 1 )[0]
+        if arg in _reader_flags:
+            reader_args.append( arg )
+        elif name in _reader_options:
+            reader_args.append( arg )
+            if "=" not in arg:
+                # the value is the next argument
+                value = next( args, None )
+                if value is not None:
+                    reader_args.append( value )
+        elif arg[:2] in _reader_short_options and len( arg ) > 2 and not arg.startswith( "--" ):
+            # -fmarkdown
+            reader_args.append( arg )
+        else:
+            writer_args.append( arg )
+    return tuple( reader_args ), writer_args
+
+def parse_markdown(text, cwd=None, reader_args=()):
+    # pandoc's JSON AST of the report, rendered into every requested format
+    return run_pandoc( text, "md", "json", reader_args, cwd=cwd )
+
+def render_formats(text, jobs, cwd=None, parallel=True):
+    """
+    Convert one markdown report into several formats.
+
+    jobs is a list of (to, extra_args, output_file, backend). Jobs of the
+    "native" backend are written in-process, jobs of the "pool" backend are
+    converted by long-lived pandoc workers. For the others, the markdown is
+    parsed once for all jobs with the same reader options (--from, ...) and
+    the formats are rendered concurrently from the AST (one after another if
+    `parallel` is false, e.g. when the caller runs reports in parallel). A job
+    whose reader options differ from all others is converted directly.
+    Returns a list of (output_file, error) for the failed jobs.
+    """
+    errors = []
+    native_jobs = [ job for job in jobs if job[3] == "native" ]
+    if len( native_jobs ) > 0:
+        from .converters import convert_native
+        fallback, errors = convert_native( text, native_jobs )
+        jobs = [ job for job in jobs if job[3] != "native" ] + fallback
+
+    pool_jobs = [ job for job in jobs if job[3] == "pool" ]
+    if len( pool_jobs ) > 0:
+        from .pandoc_pool import convert_with_pool
+        jobs = [ job for job in jobs if job[3] != "pool" ] + convert_with_pool( text, pool_jobs, cwd )
+
+    if len( jobs ) == 0:
+        return errors
+
+    # jobs with the same reader options share one parsed document
+    groups = {}
+    for job in jobs:
+        reader_args, writer_args = split_reader_args( job[1] )
+        groups.setdefault( reader_args, [] ).append( ( job, writer_args ) )
+
+    renders = []
+    for reader_args, group in groups.items():
+        if len( group ) == 1:
+            job = group[0][0]
+            renders.append( ( text, "md", job[0], job[1], job[2] ) )
+            continue
+        try:
+            with profile( "parse", "markdown" ):
+                source = parse_markdown( text, cwd, reader_args )
+        except Exception as e:
+            errors += [ ( job[2], e ) for job, writer_args in group ]
+            continue
+        renders += [ ( source, "json", job[0], writer_args, job[2] ) for job, writer_args in group ]
+
+    def render(item):
+        source, from_format, to, extra_args, output_file = item
+        try:
+            with profile( "convert", to ):
+                run_pandoc( source, from_format, to, extra_args, output_file, cwd )
+        except Exception as e:
+            return ( output_file, e )
+        return None
+
+    results = None
+    if len( renders ) > 1 and parallel:
+        try:
+            with ThreadPoolExecutor( max_workers=len( renders ) ) as executor:
+                results = list( executor.map( render, renders ) )
+        except RuntimeError:
+            # no new threads once the interpreter shuts down
+            results = None
+    if results is None:
+        results = [ render( item ) for item in renders ]
+    return errors + [ result for result in results if result is not None ]
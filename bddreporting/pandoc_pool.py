@@ -0,0 +1,211 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import subprocess
+from .config import Config
+from .buffer import ReportBuffer
+from .profiler import profile
+
+# Conversion backend "pool": long-lived `pandoc lua` processes running
+# pandoc_worker.lua, so a report costs one request instead of a process start.
+# (`pandoc server` would be the obvious choice, but the binary bundled with
+# pypandoc-binary is built without the threaded runtime the server needs.)
+
+WORKER_SCRIPT = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "pandoc_worker.lua" )
+
+class PandocWorker:
+
+    def __init__(self, pandoc_path, timeout=None):
+        creation_flags = 0x08000000 if os.name == "nt" else 0
+        self._timeout = timeout
+        self._process = subprocess.Popen(
+            [ pandoc_path, "lua", WORKER_SCRIPT ],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1, creationflags=creation_flags,
+        )
+        # responses are read on a thread, so a hanging worker can time out
+        self._responses = queue.Queue()
+        threading.Thread( target=self._read, daemon=True, name="bddreporting-pandoc-worker" ).start()
+
+    def _read(self):
+        for line in self._process.stdout:
+            self._responses.put( line )
+        self._responses.put( "" )
+
+    @property
+    def alive(self):
+        return self._process.poll() is None
+
+    def request(self, payload):
+        self._process.stdin.write( json.dumps( payload, ensure_ascii=False ) + "\n" )
+        self._process.stdin.flush()
+        try:
+            line = self._responses.get( timeout=self._timeout )
+        except queue.Empty:
+            # the worker is stopped, so the pool starts a new one
+            self._process.kill()
+            self._process.wait()
+            raise TimeoutError( f"pandoc worker did not answer within {self._timeout} s" )
+        if not line:
+            raise RuntimeError( "pandoc worker exited unexpectedly" )
+        return json.loads( line )
+
+    def close(self):
+        try:
+            self._process.stdin.close()
+            self._process.wait( timeout=5 )
+        except Exception:
+            self._process.kill()
+
+class PandocPool:
+    """A fixed number of pandoc workers, started on demand."""
+
+    def __init__(self, size, timeout=None):
+        self._size = size
+        self._timeout = timeout
+        self._started = 0
+        self._idle = []
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def acquire(self):
+        # an idle worker, a new one while fewer than size are started, else wait
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self._size:
+                    self._started += 1
+                    break
+                self._condition.wait()
+        try:
+            from .pandoc import get_pandoc_path
+            worker = PandocWorker( get_pandoc_path(), self._timeout )
+        except BaseException:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._workers.append( worker )
+        return worker
+
+    def release(self, worker):
+        with self._condition:
+            if worker.alive:
+                self._idle.append( worker )
+            else:
+                # a dead worker frees its place, a waiting thread starts a new one
+                if worker in self._workers:
+                    self._workers.remove( worker )
+                self._started -= 1
+            self._condition.notify()
+
+    def request(self, payload):
+        worker = self.acquire()
+        try:
+            return worker.request( payload )
+        finally:
+            self.release( worker )
+
+    def close(self):
+        with self._condition:
+            workers, self._workers = self._workers, []
+            self._idle = []
+            self._started = 0
+        for worker in workers:
+            worker.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = Config.snapshot()
+            _pool = PandocPool( config.pandoc_pool_size, config.pandoc_pool_timeout )
+            atexit.register( close_pool )
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+# command line options of pandoc that map to writer options of the worker
+_flags = {
+    "--toc": ( "table_of_contents", True ),
+    "--table-of-contents": ( "table_of_contents", True ),
+    "-N": ( "number_sections", True ),
+    "--number-sections": ( "number_sections", True ),
+    "-s": ( "standalone", True ),
+    "--standalone": ( "standalone", True ),
+}
+_values = {
+    "--toc-depth": ( "toc_depth", int ),
+    "--columns": ( "columns", int ),
+    "--reference-doc": ( "reference_doc", str ),
+}
+
+def writer_options(extra_args):
+    # returns None if an argument cannot be passed to the worker
+    options = {}
+    for arg in extra_args:
+        if arg in _flags:
+            key, value = _flags[arg]
+            options[key] = value
+            continue
+        name, separator, value = arg.partition("=")
+        if separator and name in _values:
+            key, convert = _values[name]
+            try:
+                options[key] = convert( value )
+            except ValueError:
+                return None
+            continue
+        return None
+    return options
+
+def convert_with_pool(text, jobs, cwd=None):
+    """
+    Convert a report with the worker pool.
+
+    jobs is a list of (to, extra_args, output_file, backend). Returns the jobs
+    that have to be converted by the subprocess backend instead: jobs with
+    options the worker does not support, or all jobs if the worker failed.
+    """
+    import pypandoc
+
+    outputs = []
+    fallback = []
+    for job in jobs:
+        to, extra_args, output_file, backend = job
+        options = writer_options( extra_args )
+        if options is None:
+            fallback.append( job )
+        else:
+            outputs.append( { "to": pypandoc.normalize_format( to ), "options": options, "output": output_file } )
+    if len( outputs ) == 0:
+        return fallback
+
+    payload = { "from": "markdown", "cwd": cwd, "outputs": outputs }
+    if isinstance( text, ReportBuffer ) and text.spilled:
+        payload["files"] = text.input_files()
+    else:
+        payload["text"] = str( text )
+
+    try:
+        with profile( "convert", "pool" ):
+            response = get_pool().request( payload )
+    except Exception as e:
+        response = { "ok": False, "error": str( e ) }
+    if not response.get("ok"):
+        logging.warning( "pandoc worker failed, falling back to pandoc subprocesses: %s", response.get("error") )
+        return fallback + [ job for job in jobs if job not in fallback ]
+    return fallback
@@ -0,0 +1,47 @@
+-- Long-lived pandoc worker for the "pool" conversion backend of bddreporting.
+-- Reads one JSON request per line from stdin, parses the document once,
+-- writes every requested output file and answers with one JSON line.
+
+local json = pandoc.json
+
+local function convert(request)
+  local text = request.text
+  if request.files then
+    local parts = {}
+    for _, path in ipairs(request.files) do
+      local file = assert(io.open(path, "rb"))
+      parts[#parts + 1] = file:read("a")
+      file:close()
+    end
+    text = table.concat(parts)
+  end
+  local doc = pandoc.read(text, request.from or "markdown")
+  for _, job in ipairs(request.outputs) do
+    local options = job.options or {}
+    if options.standalone then
+      options.standalone = nil
+      options.template = pandoc.template.compile(pandoc.template.default(job.to))
+    end
+    local output = pandoc.write(doc, job.to, options)
+    local file = assert(io.open(job.output, "wb"))
+    file:write(output)
+    file:close()
+  end
+end
+
+for line in io.stdin:lines() do
+  local ok, err = pcall(function()
+    local request = json.decode(line, false)
+    if request.cwd then
+      pandoc.system.with_working_directory(request.cwd, function() convert(request) end)
+    else
+      convert(request)
+    end
+  end)
+  if ok then
+    io.stdout:write('{"ok": true}\n')
+  else
+    io.stdout:write(json.encode({ ok = false, error = tostring(err) }) .. "\n")
+  end
+  io.stdout:flush()
+end
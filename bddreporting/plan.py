@@ -0,0 +1,63 @@
+from .config import Config
+from .utils import extract_multiline_string, report_target, report_outputs
+from .outline import outline_of, outline_template, outline_report_name
+
+# What happens with the report of a feature or scenario is decided once in
+# before_feature / before_scenario. The hooks and @report steps read the plan
+# instead of checking tags and resolving formats and paths again.
+
+class ReportPlan:
+    """
+    The reporting decision for one feature or scenario.
+
+    `outputs` are the files of the report the text ends up in: the scenario
+    report with `export_scenario`, the feature report otherwise. `header` is
+    the header template, rendered when the report is assembled.
+    """
+
+    __slots__ = ( "version", "item", "reported", "tags", "formats", "directory", "basename", "outputs", "header" )
+
+    def __init__(self, config, item, tags, report_tags, feature, scenario_name, header):
+        self.version = config.version
+        self.item = item
+        self.tags = frozenset( tags )
+        self.reported = config.is_reported( self.tags )
+        report_tags = frozenset( report_tags )
+        self.formats = config.formats_for_tags( report_tags )
+        _, self.directory, self.basename = report_target( feature.filename, feature.name, scenario_name )
+        self.outputs = report_outputs( self.directory, self.basename, scenario_name, self.formats )
+        self.header = header
+
+def new_feature_plan(feature):
+    config = Config.snapshot()
+    header = config.feature_header or extract_multiline_string( feature.description )
+    return ReportPlan( config, feature, feature.tags, feature.tags, feature, "_unknown_", header )
+
+def new_scenario_plan(scenario):
+    config = Config.snapshot()
+    feature = scenario.feature
+    outline = outline_of( scenario )
+    if outline is None:
+        header = config.scenario_header or extract_multiline_string( scenario.description )
+    else:
+        # the rows of an outline share its prepared header
+        header = outline_template( outline ).header
+        if config.export_scenario and config.consolidate_outlines:
+            return ReportPlan( config, scenario, scenario.tags, outline.tags, feature, outline_report_name( outline ), header )
+    if config.export_scenario:
+        return ReportPlan( config, scenario, scenario.tags, scenario.tags, feature, scenario.name, header )
+    return ReportPlan( config, scenario, scenario.tags, feature.tags, feature, "_unknown_", header )
+
+def feature_plan(feature):
+    # the plan of before_feature, made again if the settings changed since
+    plan = getattr( feature, "bddreporting_plan", None )
+    if plan is None or plan.version != Config.snapshot().version:
+        plan = feature.bddreporting_plan = new_feature_plan( feature )
+    return plan
+
+def scenario_plan(context):
+    # the plan of before_scenario, made again for another scenario or changed settings
+    plan = getattr( context, "bddreporting_plan", None )
+    if plan is None or plan.item is not context.scenario or plan.version != Config.snapshot().version:
+        plan = context.bddreporting_plan = new_scenario_plan( context.scenario )
+    return plan
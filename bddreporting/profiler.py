@@ -0,0 +1,119 @@
+import os
+import csv
+import json
+import time
+import atexit
+import logging
+import threading
+from contextlib import nullcontext
+from .config import Config
+
+# Opt-in timing of the reporting work. Samples are recorded per stage (hook,
+# render, convert, ...) and name; `profile` returns a shared no-op context when
+# profiling is disabled, so the instrumentation costs one settings lookup.
+
+class Profiler:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._callback = None
+        self._atexit_registered = False
+        self.dirty = False
+
+    def record(self, stage, name, wall, cpu):
+        with self._lock:
+            samples = self._samples.get( ( stage, name ) )
+            if samples is None:
+                samples = self._samples[ ( stage, name ) ] = []
+                if not self._atexit_registered:
+                    atexit.register( write_profile )
+                    self._atexit_registered = True
+            samples.append( ( wall, cpu ) )
+            self.dirty = True
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def summary(self):
+        with self._lock:
+            self.dirty = False
+            items = [ ( key, list( samples ) ) for key, samples in self._samples.items() ]
+        rows = []
+        for ( stage, name ), samples in sorted( items, key=lambda item: ( item[0][0], str( item[0][1] ) ) ):
+            walls = sorted( wall for wall, cpu in samples )
+            rows.append( {
+                "stage": stage,
+                "name": name,
+                "count": len( walls ),
+                "wall_total": sum( walls ),
+                "wall_mean": sum( walls ) / len( walls ),
+                "wall_p50": percentile( walls, 50 ),
+                "wall_p90": percentile( walls, 90 ),
+                "wall_p99": percentile( walls, 99 ),
+                "wall_max": walls[-1],
+                "cpu_total": sum( cpu for wall, cpu in samples ),
+            } )
+        return rows
+
+    def write(self, path):
+        rows = self.summary()
+        directory = os.path.dirname( os.path.abspath( path ) )
+        os.makedirs( directory, exist_ok=True )
+        if path.lower().endswith(".csv"):
+            with open( path, "w", encoding="utf-8", newline="" ) as file:
+                writer = csv.DictWriter( file, fieldnames=list( rows[0].keys() ) if rows else [ "stage", "name", "count" ] )
+                writer.writeheader()
+                writer.writerows( rows )
+        else:
+            with open( path, "w", encoding="utf-8" ) as file:
+                json.dump( { "unit": "seconds", "stages": rows }, file, indent=2 )
+        if self._callback is not None:
+            try:
+                self._callback( rows )
+            except Exception as e:
+                logging.error("Profile callback failed: %s", e)
+        return rows
+
+def percentile(sorted_values, percent):
+    index = max( 0, min( len( sorted_values ) - 1, int( round( percent / 100 * ( len( sorted_values ) - 1 ) ) ) ) )
+    return sorted_values[index]
+
+class _Timer:
+
+    __slots__ = ( "stage", "name", "wall", "cpu" )
+
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *args):
+        profiler.record( self.stage, self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu )
+        return False
+
+profiler = Profiler()
+_disabled = nullcontext()
+
+def profile(stage, name):
+    if not Config.snapshot().profile:
+        return _disabled
+    return _Timer( stage, name )
+
+def set_profile_callback(callback):
+    # callback( rows ) is called with the summary rows when the profile is written
+    profiler.set_callback( callback )
+
+def write_profile():
+    config = Config.snapshot()
+    if not config.profile or not config.profile_output or not profiler.dirty:
+        return None
+    return profiler.write( config.profile_output )
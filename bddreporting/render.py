@@ -0,0 +1,44 @@
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from .config import Config
+from .journal import read_journal, filter_reports
+
+def _init_worker(settings):
+    Config.update( **settings )
+
+def _render_record(record):
+    from .utils import write_text
+    try:
+        write_text( record["text"], record["filename"], record["feature"], record["scenario"], record["tags"] )
+    except Exception as e:
+        return f"{e}"
+    return None
+
+def render_journal(path, settings=None, features=None, scenarios=None, tags=None, jobs=None):
+    """
+    Render the reports recorded in a journal again.
+
+    settings are merged over the settings recorded in the journal. Returns the
+    number of rendered reports and a list of (record, error) for failures.
+    """
+    journal_settings, reports = read_journal( path )
+    journal_settings.update( settings or {} )
+    # the journal itself must not be rewritten while rendering from it
+    journal_settings["journal_file"] = None
+    reports = filter_reports( reports, features, scenarios, tags )
+
+    errors = []
+    if len( reports ) == 0:
+        return 0, errors
+
+    with ProcessPoolExecutor( max_workers=jobs, initializer=_init_worker, initargs=( journal_settings, ) ) as executor:
+        for record, error in zip( reports, executor.map( _render_record, reports ) ):
+            if error is not None:
+                logging.error("Failed to render report for '%s' (%s): %s", record["scenario"], record["filename"], error)
+                errors.append( ( record, error ) )
+    return len( reports ), errors
+
+def load_settings(path):
+    with open( path, "r", encoding="utf-8" ) as file:
+        return json.load( file )
@@ -1,13 +1,19 @@
 import os
+import re
+import time
 import inspect
-from mako.template import Template
-from mako.lookup import TemplateLookup
+import hashlib
+import tempfile
+import functools
 from functools import wraps
+from collections import OrderedDict
 import logging
-from datetime import datetime
-from behave.model_core import Status
 from .utils import applyJinja2Template, get_current_date_time
 from .config import Config
+from .buffer import new_scenario_log
+from .assets import asset_helper
+from .plan import scenario_plan
+from .profiler import profile
 
 def report(template = None, filename = None):
     def decorator(func):
@@ -21,9 +27,14 @@ def report(template = None, filename = None):
                 pass
 
             # Log the doc string if needed after successful execution
-            report_tag = Config.get("report_tag", "report")
-            if not report_tag or report_tag in context.scenario.tags:
-                doc_string_to_log( context, func, args, kwargs, template, filename )
+            if scenario_plan( context ).reported:
+                start = time.perf_counter()
+                with profile( "render", func.__name__ ):
+                    doc_string_to_log( context, func, args, kwargs, template, filename )
+                if Config.snapshot().index_file:
+                    # render time of the scenario in the run index
+                    scenario = context.scenario
+                    scenario.bddreporting_render_time = getattr( scenario, "bddreporting_render_time", 0.0 ) + time.perf_counter() - start
             return result
         return wrapper
     return decorator
@@ -33,10 +44,10 @@ def doc_string_to_log(context, func,  args, kwargs, template, filename):
     scenario = context.scenario
     current_date, current_time = get_current_date_time()
 
-    if Config.get("process_gherkin_doc_string", True) and hasattr(context, 'text') and isinstance(context.text, str) and context.text:
+    if Config.snapshot().process_gherkin_doc_string and hasattr(context, 'text') and isinstance(context.text, str) and context.text:
         # use Jinja2 template
         try:
-            rendered_content = applyJinja2Template(context.text, { "scenario": scenario.name , "feature": scenario.feature.name, "date": current_date, "time": current_time } )            
+            rendered_content = applyJinja2Template(context.text, { "scenario": scenario.name , "feature": scenario.feature.name, "date": current_date, "time": current_time, "asset": asset_helper( scenario.feature ) } )            
             logging.info(f"Template rendered successfully.")
             text += rendered_content + "\n" * 2
 
@@ -44,41 +55,157 @@ def doc_string_to_log(context, func,  args, kwargs, template, filename):
             pass
 
     # pocess the python step definition
+    directory = scenario.feature.feature_file_abspath
+    template_key = None
     if template:
-        template_text = str( template )
+        template_key = ( func, directory, "template", str( template ) )
+        load_text = lambda: str( template )
     elif filename:
-        full_path = os.path.join( scenario.feature.feature_file_abspath , filename)
-        if os.path.exists( full_path ):
-            with open(full_path, 'r', encoding='utf-8') as file:
-                template_text = file.read()
-        else:
-            template_text = f"**missing template file: {full_path}**"
-    elif inspect.getdoc(func):
+        full_path = os.path.join( directory, filename)
+        try:
+            mtime = os.stat( full_path ).st_mtime_ns
+        except OSError:
+            mtime = None
+        template_key = ( func, directory, "file", full_path, mtime )
+        load_text = lambda: read_template_file( full_path )
+    elif get_docstring(func):
         # Get the docstring of the function
-        template_text = inspect.getdoc(func)
+        template_key = ( func, directory, "doc" )
+        load_text = lambda: get_docstring(func)
     else:
-        template_text = ""
-        for step in context.scenario.steps:
-            if step.status == Status.untested:
-                with open( os.path.join( scenario.feature.feature_file_abspath, os.path.basename(step.filename)), "r", encoding="utf-8") as file:                                
-                    lines = file.read().splitlines()
-                    words = lines[step.line - 1].split()
-                    template_text = " ".join(words[1:])
-                    break
-
-    if template_text:
-        lookup = TemplateLookup(directories=[scenario.feature.feature_file_abspath])
-        template = Template( template_text, lookup=lookup )
+        template_text = step_source_text( context, directory )
+        if template_text:
+            if not has_mako_syntax( template_text ):
+                # most step texts are plain text, they are not compiled and cached
+                template_key = None
+                text += template_text + "\n"
+            else:
+                template_key = ( None, directory, "step", template_text )
+                load_text = lambda: template_text
+
+    # step texts differ per parameter, their modules are not stored on disk
+    module_cache = template_key is not None and template_key[2] != "step"
+    step_template = get_mako_template( template_key, directory, load_text, module_cache ) if template_key else None
+
+    if step_template:
         if "id" in kwargs.keys():
             id_parameter = kwargs["id"] 
             logging.warning("step contains id parameter {id_parameter}. This conficts with auto generated step id: {context.current_step_id}")
-        render_args = { "id": context.current_step_id, "date": current_date, "time": current_time } | kwargs
+        render_args = { "id": context.current_step_id, "date": current_date, "time": current_time, "asset": asset_helper( scenario.feature ) } | kwargs
         if hasattr(context, "report") and isinstance(context.report, dict) and context.report:
-            render_args = render_args | {"report": context.report }
-        rendered_content = template.render(**render_args)
+            # passed by reference, large measurement tables are not copied per step
+            render_args["report"] = context.report
+        rendered_content = step_template.render(**render_args)
         text += rendered_content + "\n"
         
     if len( text ) > 0:
         if not hasattr(context, 'log'):
-            context.log = ""
+            context.log = new_scenario_log( context.scenario )
         context.log += text + "\n"
+
+# compiled step templates, keyed by function, directory and template source / file mtime,
+# the least recently used ones are dropped
+MAKO_CACHE_SIZE = 1024
+_mako_templates = OrderedDict()
+_mako_lookups = {}
+_mako_cache_stats = { "hits": 0, "misses": 0 }
+_missing = object()
+
+@functools.lru_cache(maxsize=None)
+def get_docstring(func):
+    return inspect.getdoc(func)
+
+def read_template_file(full_path):
+    if os.path.exists( full_path ):
+        with open(full_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    return f"**missing template file: {full_path}**"
+
+def get_mako_lookup(directory):
+    module_directory = Config.snapshot().mako_module_directory
+    if module_directory:
+        module_directory = os.path.abspath( module_directory )
+    key = ( directory, module_directory )
+    lookup = _mako_lookups.get( key )
+    if lookup is None:
+        # mako is only loaded when the first step template is compiled
+        from mako.lookup import TemplateLookup
+        lookup = TemplateLookup(directories=[directory], module_directory=module_directory, input_encoding="utf-8")
+        _mako_lookups[key] = lookup
+    return lookup
+
+# expressions, tags, control lines, comments and line continuations of mako
+_mako_syntax_pattern = re.compile( r"\$\{|</?%|^[ \t]*(%|##)|\\$", re.M )
+
+def has_mako_syntax(text):
+    return _mako_syntax_pattern.search( text ) is not None
+
+def get_mako_template(key, directory, load_text, module_cache=True):
+    template = _mako_templates.get( key, _missing )
+    if template is not _missing:
+        _mako_cache_stats["hits"] += 1
+        _mako_templates.move_to_end( key )
+        return template
+
+    _mako_cache_stats["misses"] += 1
+    text = load_text()
+    template = compile_mako_template( text, get_mako_lookup( directory ), module_cache ) if text else None
+    _mako_templates[key] = template
+    if len( _mako_templates ) > MAKO_CACHE_SIZE:
+        _mako_templates.popitem( last=False )
+    return template
+
+def compile_mako_template(text, lookup, module_cache=True):
+    from mako.template import Template
+    module_directory = lookup.template_args.get("module_directory")
+    if not module_directory or not module_cache:
+        return Template( text, lookup=lookup )
+
+    # with a module directory the source is stored under its hash, so mako can
+    # reuse the compiled module of an identical template in later runs
+    digest = hashlib.sha1( text.encode("utf-8") ).hexdigest()
+    source_directory = os.path.join( module_directory, "sources" )
+    source_file = os.path.join( source_directory, digest + ".mako" )
+    if not os.path.exists( source_file ):
+        os.makedirs( source_directory, exist_ok=True )
+        fd, temp_file = tempfile.mkstemp( dir=source_directory, suffix=".tmp" )
+        with os.fdopen( fd, "w", encoding="utf-8", newline="" ) as file:
+            file.write( text )
+        os.replace( temp_file, source_file )
+    return Template( filename=source_file, uri="bddreporting_" + digest, lookup=lookup, module_directory=module_directory, input_encoding="utf-8" )
+
+# lines of the feature files read for step sources, keyed by path: (mtime, lines)
+_feature_lines = {}
+_feature_lines_stats = { "hits": 0, "misses": 0 }
+
+def get_feature_lines(path):
+    mtime = os.stat( path ).st_mtime_ns
+    cached = _feature_lines.get( path )
+    if cached is not None and cached[0] == mtime:
+        _feature_lines_stats["hits"] += 1
+        return cached[1]
+    _feature_lines_stats["misses"] += 1
+    with open( path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    _feature_lines[path] = ( mtime, lines )
+    return lines
+
+def step_source_text(context, directory):
+    # text of the step currently executed: the first untested step of the scenario
+    from behave.model_core import Status
+    for step in context.scenario.steps:
+        if step.status == Status.untested:
+            if not context.active_outline and step.name:
+                # plain scenarios: the step text without its keyword is in the model
+                return " ".join( step.name.split() )
+            # outline steps are substituted in the model, the feature file keeps the placeholders
+            lines = get_feature_lines( os.path.join( directory, os.path.basename(step.filename) ) )
+            words = lines[step.line - 1].split()
+            return " ".join(words[1:])
+    return ""
+
+def step_source_info():
+    return { "hits": _feature_lines_stats["hits"], "misses": _feature_lines_stats["misses"], "files": len( _feature_lines ) }
+
+def mako_cache_info():
+    return { "hits": _mako_cache_stats["hits"], "misses": _mako_cache_stats["misses"], "size": len( _mako_templates ), "lookups": len( _mako_lookups ) }
@@ -0,0 +1,12 @@
+from .utils import jinja2_cache_info
+from .report import mako_cache_info, step_source_info
+from .assets import asset_info
+
+def cache_stats():
+    jinja2 = jinja2_cache_info()
+    return {
+        "jinja2": { "hits": jinja2.hits, "misses": jinja2.misses, "size": jinja2.currsize, "maxsize": jinja2.maxsize },
+        "mako": mako_cache_info(),
+        "step_sources": step_source_info(),
+        "assets": asset_info(),
+    }
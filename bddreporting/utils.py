@@ -1,11 +1,12 @@
 import os
-from jinja2.sandbox import SandboxedEnvironment
-from jinja2 import DictLoader, FileSystemLoader, ChoiceLoader
-import yaml
-import pypandoc
-import sys
+import functools
 import logging
 from .config import Config
+from .pandoc import render_formats
+from .converters import module_converter
+from .buffer import ReportBuffer
+from .profiler import profile
+from .manifest import report_hash, load_manifest, is_up_to_date, update_manifest, register_volatile
 from datetime import datetime
 
 def extract_multiline_string(arr):
@@ -29,109 +30,158 @@ def extract_multiline_string(arr):
     # Join the result lines into a single string
     return "\n".join(result).strip()
 
-def applyJinja2Template(template_str, context_dict = {}):
-    # Dictionary loader for the provided template string
-    string_loader = DictLoader({
-        'input_template': template_str
-    })
+# number of compiled Jinja2 templates kept per process
+JINJA2_TEMPLATE_CACHE_SIZE = 512
+
+_jinja2_environment = None
+
+def get_jinja2_environment():
+    # one sandboxed environment shared by all templates of the process
+    global _jinja2_environment
+    if _jinja2_environment is None:
+        from jinja2.sandbox import SandboxedEnvironment
+        _jinja2_environment = SandboxedEnvironment()
+    return _jinja2_environment
 
-    # Create a sandboxed Jinja2 environment with both loaders (string and file-based templates)
-    env = SandboxedEnvironment(
-        loader=ChoiceLoader([string_loader])
-    )
+@functools.lru_cache(maxsize=JINJA2_TEMPLATE_CACHE_SIZE)
+def compileJinja2Template(template_str):
+    # compiled templates are keyed by their source text
+    return get_jinja2_environment().from_string(template_str)
 
-    # Load the input template from the string loader
-    template = env.get_template('input_template')
+def jinja2_cache_info():
+    return compileJinja2Template.cache_info()
+
+def applyJinja2Template(template_str, context_dict = {}):
+    with profile( "template", "jinja2" ):
+        return _applyJinja2Template( template_str, context_dict )
+
+def _applyJinja2Template(template_str, context_dict):
+    template = compileJinja2Template( template_str )
 
     # Render the template with the provided context dictionary
     try:
         rendered_content = template.render(context_dict)
         return rendered_content
     except Exception as e:
-        loggig.error(f"An error occurred during template rendering: {e}")
+        logging.error(f"An error occurred during template rendering: {e}")
         return ""
 
-def write_text( text, filename, feature_name, scenario_name, tags):
-
-    if len( text ) > 0:
-        feature_file_directory = os.path.dirname( filename )
-        feature_file_directory = os.path.abspath(feature_file_directory)
-
-        path_dict = { "filename": os.path.basename( filename ), "feature": feature_name, "scenario": scenario_name }
+def report_target( filename, feature_name, scenario_name ):
+    # returns the feature file directory, the report directory and the report base name
+    config = Config.snapshot()
+    return _report_target( filename, feature_name, scenario_name, config.report_dir, config.report_file_basename )
 
-        report_dir = applyJinja2Template( Config.get("report_dir", "reports" ), path_dict )    
+@functools.lru_cache( maxsize=4096 )
+def _report_target( filename, feature_name, scenario_name, report_dir, report_file_basename ):
+    feature_file_directory = os.path.dirname( filename )
+    feature_file_directory = os.path.abspath(feature_file_directory)
 
-        directory_path = os.path.join(feature_file_directory, report_dir )
+    path_dict = { "filename": os.path.basename( filename ), "feature": feature_name, "scenario": scenario_name }
 
-        os.makedirs( directory_path, exist_ok=True )
+    report_dir = applyJinja2Template( report_dir, path_dict )    
 
-        # Convert tags to lowercase
-        lower_tags = [tag.lower() for tag in tags]
+    directory_path = os.path.join(feature_file_directory, report_dir )
+    basename = applyJinja2Template( report_file_basename, path_dict )
+    return feature_file_directory, directory_path, basename
 
-        # Filter valid formats based on the tags
-        known_formats = Config.get("formats", {} ).keys()
-        valid_formats = [ext for ext in known_formats if ext.lower() in lower_tags]
+def report_outputs( directory_path, basename, scenario_name, formats ):
+    # the output files of a report, the markdown log if no format is selected
+    if len( formats ) > 0:
+        return tuple( os.path.join( directory_path, basename + "." + ext ) for ext in formats )
+    return ( os.path.join( directory_path, f"{scenario_name}.md" ), )
 
-        if len( valid_formats ) == 0:
-            default_formats = Config.get("default_formats", [])
-            for f in default_formats:
-                if f in known_formats:
-                    valid_formats.append( f )
+def write_text( text, filename, feature_name, scenario_name, tags, makedirs=True, parallel=True, plan=None ):
 
-        for ext in valid_formats:
-            output_file = os.path.join( directory_path, applyJinja2Template( Config.get("report_file_basename", "{{scenario}}"), path_dict ) + "." + ext )
-            format_dict = Config.get("formats", {})
-            format_data = format_dict[ext]
+    if len( text ) > 0:
+        config = Config.snapshot()
+        if plan is not None:
+            # formats and paths resolved by the hooks (see plan.py)
+            feature_file_directory = os.path.dirname( os.path.abspath( filename ) )
+            directory_path, valid_formats, outputs = plan.directory, plan.formats, plan.outputs
+        else:
+            feature_file_directory, directory_path, basename = report_target( filename, feature_name, scenario_name )
+            # Filter valid formats based on the tags, fall back to the default formats
+            valid_formats = config.formats_for_tags( tags )
+            outputs = report_outputs( directory_path, basename, scenario_name, valid_formats )
+
+        if makedirs:
+            os.makedirs( directory_path, exist_ok=True )
+
+        # the front matter is parsed once per report, not once per format
+        with profile( "front_matter", "parse" ):
+            front_matter = parse_front_matter( text )
+        pandoc_jobs = []
+
+        for ext, output_file in zip( valid_formats, outputs ):
+            format_data = config.formats[ext]
 
             module_name = format_data.get( "module", False )
 
             if not module_name:
-                # no module, use pypandoc
-                front_matter = parse_front_matter( text )
+                # no module, use pandoc
                 extra_args = format_data["extra_args"]
                 to = format_data.get("to", ext )
 
                 if front_matter and "extra_args" in front_matter:
                     extra_args = front_matter.get("extra_args", [])
 
-                try:
-                    original_working_directory = os.getcwd()
-                    os.chdir( feature_file_directory )
-                    output = pypandoc.convert_text(text, to, format='md', extra_args = extra_args, outputfile = output_file )
-                    os.chdir( original_working_directory )
-                except Exception as e:
-                    logging.error("Failed to generate report: %s", e)
+                pandoc_jobs.append( ( to, extra_args, output_file, format_data.get( "backend", "subprocess" ) ) )
             else:
-                module_dir = format_data.get( "dir", False )
-                if module_dir:
-                    abs_module_dir = os.path.join( feature_file_directory, module_dir )
-                    if os.path.exists(abs_module_dir) and abs_module_dir not in sys.path:            
-                        sys.path.append( abs_module_dir ) 
-
-                import importlib
+                convert = module_converter( module_name, format_data.get( "dir", False ), feature_file_directory )
 
                 try:
-                    module = importlib.import_module( module_name )
-                    logging.debug(f"Successfully imported module '{module_name}' for format '{ext}'.")
-                except ImportError as e:
-                    logging.warning(f"Could not import module '{module_name}' for format '{ext}': {e}")
-                    module = None
-
-                try:
-                    if module:
-                        module.convert( text, output_file, **format_data )
+                    if convert:
+                        with profile( "convert", ext ):
+                            convert( str( text ), output_file, **format_data )
                 except ImportError as e:
                     logging.warning(f"Could call convert function of module: '{module_name}' for format '{ext}': {e}")
 
+        if config.incremental:
+            pandoc_jobs, hashes = skip_unchanged( text, pandoc_jobs, front_matter, directory_path, config )
+
+        # pandoc runs in the feature file directory so relative resources resolve
+        failed = []
+        for output_file, e in render_formats( text, pandoc_jobs, cwd=feature_file_directory, parallel=parallel ):
+            logging.error("Failed to generate report: %s", e)
+            failed.append( output_file )
+
+        if config.incremental and len( pandoc_jobs ) > 0:
+            produced = { job[2]: hashes[job[2]] for job in pandoc_jobs if job[2] not in failed }
+            update_manifest( directory_path, produced, failed )
+
         if len ( valid_formats ) == 0:
             # Create file path for the scenario log
-            log_file_path = os.path.join( directory_path, f"{scenario_name}.md" )
+            log_file_path = outputs[0]
 
             # Write the log content to the file
             with open(log_file_path, "w", encoding="utf-8") as log_file:
-                log_file.write( text.strip() )
+                if isinstance( text, ReportBuffer ):
+                    text.write_to( log_file, strip=True )
+                else:
+                    log_file.write( text.strip() )
+
+# number of characters searched for the front matter of a report buffer
+FRONT_MATTER_SIZE = 65536
+
+def skip_unchanged( text, pandoc_jobs, front_matter, directory_path, config ):
+    # drops the jobs whose output exists and was produced from the same input
+    manifest = {} if config.force_rebuild else load_manifest( directory_path )
+    remaining = []
+    hashes = {}
+    for job in pandoc_jobs:
+        to, extra_args, output_file, backend = job
+        ext = os.path.splitext( output_file )[1]
+        digest = report_hash( text, ext, to, extra_args, front_matter, config.incremental_ignore_volatile )
+        if is_up_to_date( manifest, output_file, digest ):
+            logging.debug(f"Report '{output_file}' is up to date.")
+            continue
+        hashes[output_file] = digest
+        remaining.append( job )
+    return remaining, hashes
 
 def parse_front_matter(content):
+    if isinstance( content, ReportBuffer ):
+        content = content.head( FRONT_MATTER_SIZE )
     try:
         if content.startswith("---"):
             end_of_front_matter = content.find("---", 3)
@@ -139,6 +189,7 @@ def parse_front_matter(content):
                 yaml_header = content[3:end_of_front_matter].strip()
                 
                 # Parse the YAML header
+                import yaml
                 front_matter_data = yaml.safe_load(yaml_header)
                 return front_matter_data
     except:
@@ -150,4 +201,5 @@ def get_current_date_time():
     now = datetime.now()
     current_date = now.strftime('%Y-%m-%d')  # Standard date format
     current_time = now.strftime('%H-%M-%S')  # Replace colons with dashes
+    register_volatile( current_date, current_time )
     return current_date, current_time
@@ -0,0 +1,203 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from .config import Config
+from .utils import write_text, report_target
+from .journal import record_report, close_journal
+from .index import write_index
+from .profiler import profile, write_profile
+
+class ReportWriter:
+    """
+    Writes reports on a bounded pool of worker threads.
+
+    Conversions run in pandoc subprocesses, so threads are enough to keep them
+    off the critical path of the test run. `submit` blocks once `max_pending`
+    reports are queued or running. Reports for the same target are written one
+    after another and a report that was superseded before it started is
+    skipped, so the last submitted report wins as in sync mode.
+    """
+
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor( max_workers=workers, thread_name_prefix="bddreporting" )
+        self._slots = threading.BoundedSemaphore( max_pending )
+        self._lock = threading.Lock()
+        self._errors = []
+        self._sequence = 0
+        self._latest = {}
+        self._target_locks = {}
+
+    def submit(self, text, filename, feature_name, scenario_name, tags, kind="scenario", plan=None):
+        target = report_key( filename, feature_name, scenario_name, plan )
+        self._slots.acquire()
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+            self._latest[target] = sequence
+            target_lock = self._target_locks.setdefault( target, threading.Lock() )
+        try:
+            future = self._executor.submit( self._write, target, target_lock, sequence, text, filename, feature_name, scenario_name, tags, kind, plan )
+        except:
+            self._slots.release()
+            raise
+        future.add_done_callback( lambda future: self._done( future, filename, scenario_name ) )
+
+    def _write(self, target, target_lock, sequence, text, filename, feature_name, scenario_name, tags, kind, plan):
+        with target_lock:
+            with self._lock:
+                if self._latest[target] != sequence:
+                    return
+            with profile( "write", kind ):
+                write_text( text, filename, feature_name, scenario_name, tags, plan=plan )
+
+    def _done(self, future, filename, scenario_name):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            logging.error("Failed to write report for '%s' (%s): %s", scenario_name, filename, error)
+            with self._lock:
+                self._errors.append( ( filename, scenario_name, error ) )
+
+    def drain(self):
+        self._executor.shutdown( wait=True )
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+class BatchWriter:
+    """
+    Collects reports and converts them all at the end of the run.
+
+    `drain` keeps the last report per output target, creates every report
+    directory once, orders the reports by their formats and converts them in
+    parallel on all cores (`batch_workers`).
+    """
+
+    def __init__(self, workers):
+        self._workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._reports = []
+
+    def submit(self, text, filename, feature_name, scenario_name, tags, kind="scenario", plan=None):
+        with self._lock:
+            self._reports.append( ( text, filename, feature_name, scenario_name, tags, kind, plan ) )
+
+    def drain(self):
+        with self._lock:
+            reports, self._reports = self._reports, []
+        start = time.perf_counter()
+        config = Config.snapshot()
+
+        # the last report submitted for an output target wins, as in sync mode
+        latest = {}
+        for index, report in enumerate( reports ):
+            target = report_key( report[1], report[2], report[3], report[6] )
+            latest[target] = index
+        selected = [ reports[index] for index in sorted( latest.values() ) ]
+
+        directories = { directory for directory, basename in latest }
+        for directory in directories:
+            os.makedirs( directory, exist_ok=True )
+
+        formats = [ report[6].formats if report[6] is not None else config.formats_for_tags( report[4] ) for report in selected ]
+        order = sorted( range( len( selected ) ), key=lambda index: formats[index] )
+        outputs = Counter( ext for index in order for ext in formats[index] )
+
+        def write(report):
+            text, filename, feature_name, scenario_name, tags, kind, plan = report
+            with profile( "write", kind ):
+                write_text( text, filename, feature_name, scenario_name, tags, makedirs=False, parallel=False, plan=plan )
+
+        def write_serial(report):
+            try:
+                write( report )
+            except Exception as e:
+                return e
+            return None
+
+        errors = []
+        try:
+            with ThreadPoolExecutor( max_workers=self._workers, thread_name_prefix="bddreporting" ) as executor:
+                futures = [ ( selected[index], executor.submit( write, selected[index] ) ) for index in order ]
+            results = [ ( report, future.exception() ) for report, future in futures ]
+        except RuntimeError:
+            # no new threads once the interpreter shuts down, convert one after another
+            results = [ ( selected[index], write_serial( selected[index] ) ) for index in order ]
+        for report, error in results:
+            if error is not None:
+                logging.error("Failed to write report for '%s' (%s): %s", report[3], report[1], error)
+                errors.append( ( report[1], report[3], error ) )
+
+        elapsed = time.perf_counter() - start
+        produced = ", ".join( f"{count} {ext}" for ext, count in sorted( outputs.items() ) ) or "no converted files"
+        print( f"bddreporting: {len( selected )} report(s) ({len( reports ) - len( selected )} superseded) in {len( directories )} director{'y' if len( directories ) == 1 else 'ies'}: {produced}; {len( errors )} failed; {elapsed:.2f} s with {self._workers} worker(s)" )
+        return errors
+
+_writer = None
+_writer_lock = threading.Lock()
+_atexit_registered = False
+
+def get_writer():
+    global _writer, _atexit_registered
+    with _writer_lock:
+        if _writer is None:
+            config = Config.snapshot()
+            if config.writer_mode == "batch":
+                _writer = BatchWriter( config.batch_workers )
+            else:
+                _writer = ReportWriter( config.writer_workers, config.writer_max_pending )
+            if not _atexit_registered:
+                _register_exit( flush_reports )
+                _atexit_registered = True
+        return _writer
+
+def _register_exit(func):
+    # atexit handlers run after concurrent.futures is shut down, the pending
+    # reports have to be written before, while threads can still be started
+    register = getattr( threading, "_register_atexit", None )
+    if register is not None:
+        try:
+            register( func )
+            return
+        except RuntimeError:
+            pass
+    atexit.register( func )
+
+def report_key(filename, feature_name, scenario_name, plan=None):
+    # the report directory and base name, from the plan of the hooks if there is one
+    if plan is not None:
+        return ( plan.directory, plan.basename )
+    return report_target( filename, feature_name, scenario_name )[1:]
+
+def submit_report(text, filename, feature_name, scenario_name, tags, kind="scenario", plan=None):
+    # plan (see plan.py) carries the formats and paths already resolved by the hooks
+    record_report( text, filename, feature_name, scenario_name, tags, kind )
+    if Config.snapshot().writer_mode in ( "async", "batch" ):
+        get_writer().submit( text, filename, feature_name, scenario_name, tags, kind, plan )
+    else:
+        with profile( "write", kind ):
+            write_text( text, filename, feature_name, scenario_name, tags, plan=plan )
+
+def flush_reports():
+    # wait for all queued reports, returns the (filename, scenario, error) of failed ones
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is None:
+        return []
+    errors = writer.drain()
+    if errors:
+        logging.error("%d report(s) could not be written", len( errors ))
+    return errors
+
+def finish_reports():
+    # final step of a run: writes pending reports, the index and closes the journal
+    errors = flush_reports()
+    write_index()
+    close_journal()
+    write_profile()
+    return errors
@@ -0,0 +1,62 @@
+"""
+Reports per second of the pandoc conversion backends.
+
+Writes `reports` small per-scenario reports through write_text with the
+subprocess backend (one pandoc process per conversion), the pool backend
+(long-lived pandoc workers) and the native backend (in-process writers for
+md, txt and html; docx falls back to pandoc).
+
+    python benchmarks/bench_backends.py [reports] [formats]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bddreporting import Config
+from bddreporting.utils import write_text
+from bddreporting.pandoc_pool import close_pool
+
+REPORT = """## Scenario {index}
+
+stand on at 12-00-00
+
+| quantity | value |
+|----------|-------|
+| sample 1 | {index} |
+| sample 2 | {index} |
+"""
+
+FORMATS = {
+    "docx": {"extra_args": ["--toc"]},
+    "html": {"extra_args": []},
+    "txt": {"to": "plain", "extra_args": []},
+}
+
+def run(backend, reports, formats):
+    Config.update(
+        report_file_basename="{{scenario}}",
+        formats={name: dict(data, backend=backend) for name, data in FORMATS.items()},
+        default_formats=formats,
+    )
+    with tempfile.TemporaryDirectory(prefix="bddreporting-bench-") as directory:
+        filename = os.path.join(directory, "synthetic.feature")
+        start = time.perf_counter()
+        for index in range(reports):
+            write_text(REPORT.format(index=index), filename, "Synthetic", f"scenario {index}", [])
+        elapsed = time.perf_counter() - start
+    close_pool()
+    return reports / elapsed
+
+def main(reports=50, formats="docx,txt"):
+    formats = formats.split(",")
+    print(f"{reports} reports, formats {', '.join(formats)}")
+    results = {}
+    for backend in ("subprocess", "pool", "native"):
+        results[backend] = run(backend, reports, formats)
+        print(f"{backend:12} {results[backend]:8.1f} reports/s ({results[backend] / results['subprocess']:.2f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50, sys.argv[2] if len(sys.argv) > 2 else "docx,txt")
@@ -0,0 +1,47 @@
+"""
+Micro-benchmark for the per-step configuration overhead.
+
+Every reported step reads a handful of settings (report tag, doc string
+processing, header, export mode, formats). This script compares reading them
+with a full schema validation per lookup (the behaviour before the config
+snapshot) against reading them from `Config.snapshot()`.
+
+    python benchmarks/bench_config.py [steps]
+"""
+import sys
+import os
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from jsonschema import validate as validate_json
+from bddreporting import Config
+
+KEYS = ["report_tag", "process_gherkin_doc_string", "scenario_header", "export_scenario", "halt_execution_on_failure", "formats", "default_formats"]
+TAGS = ["report", "docx"]
+
+def validated_step():
+    for key in KEYS:
+        validate_json(instance=Config._settings, schema=Config._schema)
+        Config._settings.get(key)
+
+def snapshot_step():
+    config = Config.snapshot()
+    config.is_reported(TAGS)
+    config.process_gherkin_doc_string
+    config.scenario_header
+    config.export_scenario
+    config.halt_execution_on_failure
+    config.formats_for_tags(TAGS)
+
+def main(steps=2000):
+    Config.update(report_tag="report")
+    before = timeit.timeit(validated_step, number=steps) / steps
+    after = timeit.timeit(snapshot_step, number=steps) / steps
+    print(f"steps:                {steps}")
+    print(f"validate per lookup:  {before * 1e6:10.2f} us/step")
+    print(f"config snapshot:      {after * 1e6:10.2f} us/step")
+    print(f"speedup:              {before / after:10.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
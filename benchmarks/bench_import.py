@@ -0,0 +1,48 @@
+"""
+Import-time check for bddreporting.
+
+Measures `import bddreporting` in fresh interpreters and fails if any of the
+heavy dependencies is loaded at import time. They must only be loaded on
+first use (jsonschema on validation, jinja2 / mako on rendering, yaml and
+pypandoc when a report is written, behave when a step source is looked up).
+
+    python benchmarks/bench_import.py [runs]
+"""
+import os
+import sys
+import json
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["jsonschema", "mako", "jinja2", "yaml", "pypandoc", "behave"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import bddreporting
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def measure(runs=5):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], env=env, stdout=subprocess.PIPE, check=True, text=True).stdout
+        results.append(json.loads(output))
+    return results
+
+def main(runs=5):
+    results = measure(runs)
+    best = min(result["seconds"] for result in results)
+    loaded = sorted(set(module for result in results for module in result["loaded"]))
+    print(f"import bddreporting: {best * 1e3:.1f} ms (best of {runs})")
+    if loaded:
+        print(f"heavy modules loaded at import time: {', '.join(loaded)}")
+        return 1
+    print("no heavy modules loaded at import time")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
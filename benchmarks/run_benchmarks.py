@@ -0,0 +1,170 @@
+"""
+Benchmark suite for the reporting hot paths.
+
+Generates synthetic behave projects (see synthetic.py) and runs them in both
+export_scenario modes. For every case it measures the end-to-end run time,
+the peak memory of the behave process and, from a profiled run, the per-step
+hook and render overhead and the mean conversion time per format.
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --mock-pandoc --features 4 --rows 500
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic import generate_project
+
+def peak_memory_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def child(features_dir):
+    from behave.__main__ import main as behave_main
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            status = behave_main([features_dir, "--no-summary", "--format", "null", "--no-capture"])
+        finally:
+            sys.stdout = stdout
+    print(json.dumps({"status": status, "peak_memory_kb": peak_memory_kb()}))
+
+def run_behave(features_dir, config, mock_pandoc):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["BDDREPORTING_BENCH_CONFIG"] = json.dumps(config)
+    if mock_pandoc:
+        env["BDDREPORTING_BENCH_MOCK_PANDOC"] = "1"
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", features_dir], env=env, cwd=os.path.dirname(features_dir), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"behave run failed: {process.stderr}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result["wall"] = wall
+    return result
+
+def summarize_profile(path, total_steps):
+    with open(path, "r", encoding="utf-8") as file:
+        stages = json.load(file)["stages"]
+    hook_total = sum(row["wall_total"] for row in stages if row["stage"] == "hook")
+    render_total = sum(row["wall_total"] for row in stages if row["stage"] == "render")
+    return {
+        "hook_seconds_per_step": hook_total / total_steps,
+        "render_seconds_per_step": render_total / total_steps,
+        "convert_mean_seconds": {row["name"]: row["wall_mean"] for row in stages if row["stage"] == "convert"},
+        "stages": stages,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(args):
+    total_steps = args.features * (args.scenarios + args.rows) * args.steps
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "features": args.features,
+            "scenarios": args.scenarios,
+            "steps": args.steps,
+            "rows": args.rows,
+            "repeat": args.repeat,
+            "mock_pandoc": args.mock_pandoc,
+            "total_steps": total_steps,
+        },
+        "cases": {},
+    }
+    for export_scenario in (False, True):
+        name = f"export_scenario={export_scenario}"
+        walls = []
+        peak = None
+        with tempfile.TemporaryDirectory(prefix="bddreporting-bench-") as directory:
+            features_dir = generate_project(directory, args.features, args.scenarios, args.steps, args.rows)
+            config = {"export_scenario": export_scenario, "report_file_basename": "{{scenario}}" if export_scenario else "{{feature}}"}
+            for _ in range(args.repeat):
+                result = run_behave(features_dir, config, args.mock_pandoc)
+                walls.append(result["wall"])
+                peak = max(peak or 0, result["peak_memory_kb"] or 0) or None
+
+            profile_output = os.path.join(directory, "profile.json")
+            run_behave(features_dir, dict(config, profile=True, profile_output=profile_output), args.mock_pandoc)
+            profile = summarize_profile(profile_output, total_steps)
+
+        results["cases"][name] = {
+            "wall_seconds": min(walls),
+            "wall_seconds_all": walls,
+            "peak_memory_kb": peak,
+            **profile,
+        }
+        print(f"{name:24} wall {min(walls):8.3f} s  peak {peak or 0:8d} kB  hook {profile['hook_seconds_per_step'] * 1e6:8.1f} us/step  render {profile['render_seconds_per_step'] * 1e6:8.1f} us/step")
+        for fmt, seconds in sorted(profile["convert_mean_seconds"].items()):
+            print(f"{'':24} convert {fmt:8} {seconds * 1e3:8.2f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return results
+
+def compare(before_path, after_path):
+    with open(before_path, "r", encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, "r", encoding="utf-8") as file:
+        after = json.load(file)
+    print(f"before: {before.get('commit')}  after: {after.get('commit')}")
+    metrics = ["wall_seconds", "peak_memory_kb", "hook_seconds_per_step", "render_seconds_per_step"]
+    for name, case in after["cases"].items():
+        old = before["cases"].get(name)
+        if old is None:
+            continue
+        print(name)
+        for metric in metrics:
+            if old.get(metric) and case.get(metric) is not None:
+                print(f"  {metric:26} {old[metric]:14.6g} -> {case[metric]:14.6g}  ({case[metric] / old[metric]:6.2f}x)")
+        for fmt, seconds in sorted(case["convert_mean_seconds"].items()):
+            old_seconds = old["convert_mean_seconds"].get(fmt)
+            if old_seconds:
+                print(f"  convert {fmt:18} {old_seconds:14.6g} -> {seconds:14.6g}  ({seconds / old_seconds:6.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", type=int, default=2)
+    parser.add_argument("--scenarios", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=20, help="Examples rows of the Scenario Outline in every feature")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mock-pandoc", action="store_true", help="replace pandoc by a stub to measure the Python side only")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        run(args)
+
+if __name__ == "__main__":
+    main()
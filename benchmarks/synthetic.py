@@ -0,0 +1,137 @@
+"""
+Generator for synthetic behave projects used by the benchmarks.
+
+A project has `features` feature files with `scenarios` scenarios of `steps`
+reported steps each, plus one Scenario Outline per feature with `rows`
+Examples rows. The environment reads the bddreporting settings from the
+BDDREPORTING_BENCH_CONFIG environment variable (JSON) and replaces pandoc with
+a stub that only touches the output file when BDDREPORTING_BENCH_MOCK_PANDOC
+is set, so the Python side can be measured on its own.
+"""
+import os
+
+ENVIRONMENT = '''\
+import os
+import json
+import bddreporting as br
+from bddreporting import Config
+
+if os.environ.get("BDDREPORTING_BENCH_CONFIG"):
+    Config.update(**json.loads(os.environ["BDDREPORTING_BENCH_CONFIG"]))
+
+if os.environ.get("BDDREPORTING_BENCH_MOCK_PANDOC"):
+    import bddreporting.pandoc
+
+    def run_pandoc(source, from_format, to, extra_args=(), outputfile=None, cwd=None):
+        if outputfile:
+            with open(outputfile, "wb") as file:
+                file.write(b"")
+        return b"{}"
+
+    bddreporting.pandoc.run_pandoc = run_pandoc
+
+@br.before_feature
+def before_feature(context, feature):
+    pass
+
+@br.after_feature
+def after_feature(context, feature):
+    pass
+
+@br.before_scenario
+def before_scenario(context, scenario):
+    pass
+
+@br.after_scenario
+def after_scenario(context, scenario):
+    pass
+
+@br.before_step
+def before_step(context, step):
+    pass
+
+@br.after_step
+def after_step(context, step):
+    pass
+
+@br.after_all
+def after_all(context):
+    pass
+'''
+
+STEPS = '''\
+from behave import step
+from bddreporting import report
+
+@step('inline step {index:d}')
+@report('inline step ${index} at ${time}')
+def inline_step(context, index):
+    pass
+
+@step('measured step {index:d} with "{value}"')
+@report()
+def measured_step(context, index, value):
+    """
+    | quantity | value |
+    |----------|-------|
+    % for i in range(5):
+    | sample ${i} | ${value} |
+    % endfor
+    """
+    context.report = {"index": index, "value": value}
+
+@step('plain step {index:d}')
+@report()
+def plain_step(context, index):
+    pass
+'''
+
+def step_lines(steps, value="42"):
+    lines = []
+    for index in range(steps):
+        kind = index % 3
+        keyword = "Given" if index == 0 else "And"
+        if kind == 0:
+            lines.append(f'    {keyword} inline step {index}')
+        elif kind == 1:
+            lines.append(f'    {keyword} measured step {index} with "{value}"')
+        else:
+            lines.append(f'    {keyword} plain step {index}')
+    return lines
+
+def feature_text(number, scenarios, steps, rows):
+    lines = [
+        f"Feature: Synthetic feature {number}",
+        '  """',
+        "  Generated on {{date}} for benchmarking.",
+        '  """',
+        "",
+    ]
+    for scenario in range(scenarios):
+        lines.append(f"  Scenario: Scenario {number}.{scenario}")
+        lines.extend(step_lines(steps))
+        lines.append("")
+    if rows > 0:
+        lines.append(f"  Scenario Outline: Outline {number} <value>")
+        lines.extend(step_lines(steps, "<value>"))
+        lines.append("")
+        lines.append("    Examples:")
+        lines.append("      | value | a | b | c |")
+        for row in range(rows):
+            lines.append(f"      | {row} | a{row} | b{row} | c{row} |")
+        lines.append("")
+    return "\n".join(lines)
+
+def generate_project(directory, features=2, scenarios=5, steps=6, rows=20):
+    """Write a synthetic behave project into `directory` and return its features path."""
+    features_dir = os.path.join(directory, "features")
+    steps_dir = os.path.join(features_dir, "steps")
+    os.makedirs(steps_dir, exist_ok=True)
+    with open(os.path.join(features_dir, "environment.py"), "w", encoding="utf-8") as file:
+        file.write(ENVIRONMENT)
+    with open(os.path.join(steps_dir, "steps.py"), "w", encoding="utf-8") as file:
+        file.write(STEPS)
+    for number in range(features):
+        with open(os.path.join(features_dir, f"synthetic_{number}.feature"), "w", encoding="utf-8") as file:
+            file.write(feature_text(number, scenarios, steps, rows))
+    return features_dir
@@ -4,6 +4,7 @@ setup(
     name="bddreporting",
     version="0.1.0",
     packages=find_packages(),
+    package_data={"bddreporting": ["*.lua"]},
     install_requires=[
         "pypandoc-binary",
         "pyyaml",
@@ -12,6 +13,9 @@ setup(
         "jsonschema",
         "behave",
     ],
+    extras_require={
+        "native": ["markdown"],
+    },
     description="A library providing BDD hooks with decorators",
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",